@@ -1,11 +1,24 @@
 from subprocess import call
-from sys import exit
+from sys import exit, version_info
 
 from setuptools import Command, find_packages, setup
 
 from stormpath_cli import __version__ as version
 
 
+install_requires = [
+    'docopt>=0.6.2',
+    'pyquery>=1.2.17',
+    'requests>=2.12.4',
+    'stormpath>=2.5.1',
+    'termcolor>=1.1.0',
+]
+
+# concurrent.futures is only part of the standard library on Python 3.
+if version_info < (3, 2):
+    install_requires.append('futures>=3.0.5')
+
+
 class RunTests(Command):
     """Run all tests."""
     description = 'run tests'
@@ -39,13 +52,7 @@ setup(
     # Metadata:
     keywords = ['stormpath', 'client', 'cli', 'security', 'authentication', 'authorization'],
     license = 'Apache 2.0',
-    install_requires = [
-        'docopt>=0.6.2',
-        'pyquery>=1.2.17',
-        'requests>=2.12.4',
-        'stormpath>=2.5.1',
-        'termcolor>=1.1.0',
-    ],
+    install_requires = install_requires,
     extras_require = {
         'test': ['Sphinx==1.3.6', 'codacy-coverage', 'mock', 'python-coveralls', 'pytest', 'pytest-cov'],
     },
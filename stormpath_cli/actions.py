@@ -1,30 +1,28 @@
 from __future__ import print_function
 
-from getpass import getpass
+import csv
+import re
+import sys
+from itertools import chain
 from json import dumps, loads
-from os import getcwd
-from os.path import basename
-from subprocess import call
-from sys import exit
-from time import sleep
-
-from pyquery import PyQuery as pq
-from requests import Session
-from stormpath.client import Client
+
+from six import PY2, string_types
+from six.moves import input
+
 from stormpath.resources.account import AccountList
 from stormpath.resources.application import ApplicationList
 from stormpath.resources.account_store_mapping import AccountStoreMappingList
 from stormpath.resources.directory import DirectoryList
 from stormpath.resources.group import GroupList
-from termcolor import colored
 
-from .auth import setup_credentials, init_auth
-from .context import set_context, show_context, delete_context
-from .status import show_status
+from .concurrency import bounded_map
 from .output import get_logger, prompt
-from .resources import get_resource, get_resource_data
-from .projects import Project
-from .util import store_config_file, which
+from .index import invalidate
+from .resources import (
+    changed_attributes, find_group_href, find_resource_data, get_resource, get_resource_data,
+    index_ttl, iter_collection_data, parse_fields, project_fields,
+    save_resource_data)
+from .scheduler import schedule_client
 
 
 ATTRIBUTE_MAPS = {
@@ -107,7 +105,7 @@ RESOURCE_PRIMARY_ATTRIBUTES = {
 
 def _prompt_if_missing_parameters(coll, args, only_primary=False):
     required_coll_args = REQUIRED_ATTRIBUTES[type(coll)]
-    all_coll_args = ATTRIBUTE_MAPS[type(coll)]
+    all_coll_args = ATTRIBUTE_MAPS[type(coll)].copy()
 
     if 'href' in all_coll_args:
         all_coll_args.pop('href')
@@ -121,6 +119,13 @@ def _prompt_if_missing_parameters(coll, args, only_primary=False):
         return args
 
     remaining_coll_args = {k: v for k, v in all_coll_args.items() if v in set(all_coll_args.values()) - set(supplied_required_arguments)}
+    if remaining_coll_args and args.get('--no-prompt'):
+        missing = [v for k, v in required_coll_args.items() if v not in supplied_required_arguments]
+        if missing:
+            raise ValueError('Missing required attributes: {}.'.format(', '.join(sorted(missing))))
+
+        return args
+
     if remaining_coll_args:
         get_logger().info('Please enter the following information.  Fields with an asterisk (*) are required.')
         get_logger().info('Fields without an asterisk are optional.')
@@ -200,6 +205,10 @@ def _add_resource_to_groups(resource, args):
     Helper function for adding a resource to a group.  Right now, this is only
     specifically used when adding an Account to a Group.
 
+    Group names are resolved once per process and the memberships are
+    created concurrently. If any of them fail, all of the failures are
+    reported together in a ValueError.
+
     :param obj resource: The Stormapth resource which we'll be adding the
         specified Groups to.
     :param dict args: The CLI arguments.
@@ -209,13 +218,39 @@ def _add_resource_to_groups(resource, args):
     arg_groups = args.get('--groups')
 
     if arg_groups and hasattr(resource, 'add_group'):
-        groups = [g.strip() for g in arg_groups.split(',')]
-        for group in groups:
-            resource.add_group(group)
+        groups = [g.strip() for g in arg_groups.split(',') if g.strip()]
+        def add(group):
+            # the SDK would search for the Group by name on every call
+            resource.add_group(find_group_href(resource, group) or group)
+
+        workers = _int_option(args, '--workers', 8)
+        schedule_client(resource._client, workers)
+
+        failed = []
+        for group, _, error in bounded_map(add, groups, workers):
+            if error is not None:
+                get_logger().error("Unable to add the resource to group '{}': {}".format(group, error))
+                failed.append(group)
+
+        if failed:
+            raise ValueError('Unable to add the resource to {} of {} groups: {}.'.format(
+                len(failed), len(groups), ', '.join(failed)))
 
         return resource
 
 
+def _int_option(args, name, default=0):
+    """Reads a numeric CLI option."""
+    value = args.get(name)
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("Option '{}' expects a number, got '{}'.".format(name, value))
+
+
 def _check_account_store_mapping(coll, attrs):
     """Takes care of special create case for account store mappings"""
     if isinstance(coll, AccountStoreMappingList):
@@ -225,17 +260,84 @@ def _check_account_store_mapping(coll, attrs):
     return attrs
 
 
-def list_resources(coll, args):
-    """List action: Lists the requested Resource collection."""
+def _search(coll, args, expand=None):
+    """Narrows down a collection with the search options (ie. --query or
+    --status), expanding the links named in ``expand``. Account store
+    mappings can't be searched."""
     args = _gather_resource_attributes(coll, args)
     q = _specialized_query(coll, args, SEARCH_ATTRIBUTE_MAPS)
 
-    if not isinstance(coll, AccountStoreMappingList):
-        if q:
-            coll = coll.query(**q)
+    if isinstance(coll, AccountStoreMappingList):
+        q = {}
+    if expand:
+        q['expand'] = expand
+
+    if q:
+        coll = coll.query(**q)
 
-    for r in coll:
-        yield get_resource_data(r)
+    return coll
+
+
+def _search_matching(coll, args, action):
+    """Narrows down a collection for --all-matching, refusing to go on
+    without a search option: the whole collection would match."""
+    if isinstance(coll, AccountStoreMappingList):
+        raise ValueError("Account store mappings can't be searched, refusing to {} all of them.".format(action))
+
+    args = _gather_resource_attributes(coll, args)
+    if not _specialized_query(coll, args, SEARCH_ATTRIBUTE_MAPS):
+        raise ValueError('Refusing to {} every resource, --all-matching requires a search option '
+            '(ie. --query or --status).'.format(action))
+
+    return _search(coll, args)
+
+
+def _confirm_bulk(action, hrefs, args):
+    """Asks for confirmation before changing many Resources at once."""
+    if args.get('--force'):
+        return True
+
+    if args.get('--no-prompt'):
+        raise ValueError('Refusing to {} without --force when prompting is disabled.'.format(action))
+
+    resp = input('{} {} matching resources [y/N]? '.format(action.capitalize(), len(hrefs)))
+    return resp.upper() == 'Y'
+
+
+def _expand(args, fields):
+    """Gets the --expand value, without the links that --fields leaves out
+    of the output anyway."""
+    expand = args.get('--expand')
+    if expand and fields:
+        parts = re.findall(r'\w+(?:\([^)]*\))?', expand)
+        expand = ','.join(p for p in parts if p.split('(')[0] in fields) or None
+
+    return expand
+
+
+def _output_data(resource, args):
+    """Gets the data of a created/updated Resource, as requested with
+    --expand and --fields."""
+    fields = parse_fields(args.get('--fields'))
+    data = get_resource_data(resource, expand=_expand(args, fields))
+
+    return project_fields(data, fields) if fields else data
+
+
+def list_resources(coll, args):
+    """List action: Lists the requested Resource collection, only with the
+    attributes given with --fields, from --offset and up to --limit."""
+    fields = parse_fields(args.get('--fields'))
+    offset = _int_option(args, '--offset')
+    limit = _int_option(args, '--limit', None)
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError('Options --offset and --limit can not be negative.')
+
+    coll = _search(coll, args, expand=_expand(args, fields))
+
+    for data in iter_collection_data(coll, prefetch=_int_option(args, '--prefetch'), fields=fields,
+            offset=offset, limit=limit):
+        yield data
 
 
 def create_resource(coll, args):
@@ -251,12 +353,86 @@ def create_resource(coll, args):
     _add_resource_to_groups(resource, args)
 
     get_logger().info('Resource created.')
-    return get_resource_data(resource)
+    return _output_data(resource, args)
+
+
+def _update_patch(coll, args):
+    """Gets the attributes to set on every matching Resource from --json or
+    the name=value attributes."""
+    json_rep = args.get('--json')
+    if json_rep:
+        try:
+            patch = loads(json_rep)
+        except ValueError as e:
+            raise ValueError("Error parsing JSON: %s" % e)
+    else:
+        attrs = ATTRIBUTE_MAPS[type(coll)]
+        patch = {}
+        for attr in args.get('<attributes>', []):
+            name, _, value = attr.partition('=')
+            name = name.replace('-', '_')
+            if name not in attrs or not value:
+                raise ValueError('Unknown resource attribute: {}'.format(attr))
+
+            patch[name] = value
+
+    patch.pop('href', None)
+    if not patch:
+        raise ValueError('Nothing to update, please specify attributes like status=DISABLED.')
+
+    return patch
+
+
+def update_matching_resources(coll, args):
+    """Sets the name=value attributes on every Resource matching the search
+    options, after a single confirmation. Resources which already have
+    those values are skipped, the rest are saved on a pool of --workers."""
+    log = get_logger()
+    patch = _update_patch(coll, args)
+
+    search_args = dict(args, **{'<attributes>': [], '--json': None})
+    prefetch = _int_option(args, '--prefetch')
+
+    hrefs = []
+    unchanged = 0
+    for data in iter_collection_data(_search_matching(coll, search_args, 'update'), prefetch=prefetch):
+        if changed_attributes(data, patch):
+            hrefs.append(data['href'])
+        else:
+            unchanged += 1
+
+    if hrefs and not _confirm_bulk('update', hrefs, args):
+        return
+
+    workers = _int_option(args, '--workers', 8)
+    schedule_client(coll._client, workers)
+
+    def update(href):
+        save_resource_data(coll, href, patch)
+        invalidate(href)
+
+    updated = failed = 0
+    for i, (href, _, error) in enumerate(bounded_map(update, hrefs, workers), 1):
+        if error is None:
+            updated += 1
+        else:
+            log.error('Unable to update {}: {}'.format(href, error))
+            failed += 1
+
+        if i % 100 == 0:
+            log.info('{} of {} resources processed.'.format(i, len(hrefs)))
+
+    log.info('{} resources updated, {} unchanged, {} failed.'.format(updated, unchanged, failed))
+    return {'updated': updated, 'unchanged': unchanged, 'failed': failed}
 
 
 def update_resource(coll, args):
     """Update actions: Updates a Resource.
-    Requires an identifier like --name."""
+    Requires an identifier like --name, or --all-matching to update
+    everything matching the search options."""
+    if args.get('--all-matching'):
+        return update_matching_resources(coll, args)
+
     args = _gather_resource_attributes(coll, args)
     attrs = _specialized_query(coll, args, ATTRIBUTE_MAPS)
     attr_name, attr_value = _primary_attribute(coll, attrs)
@@ -272,23 +448,63 @@ def update_resource(coll, args):
     _add_resource_to_groups(resource, args)
 
     get_logger().info('Resource updated.')
-    return get_resource_data(resource)
+    return _output_data(resource, args)
+
+
+def delete_matching_resources(coll, args):
+    """Deletes every Resource matching the search options, after a single
+    confirmation. The matches are collected before deleting anything (so
+    that paging isn't affected by the deletes) and then deleted on a pool
+    of --workers."""
+    log = get_logger()
+    prefetch = _int_option(args, '--prefetch')
+    matching = _search_matching(coll, args, 'delete')
+    hrefs = [data['href'] for data in iter_collection_data(matching, prefetch=prefetch)]
+
+    if not hrefs:
+        log.info('No matching resources.')
+        return {'deleted': 0, 'failed': 0}
+
+    if not _confirm_bulk('delete', hrefs, args):
+        return
+
+    workers = _int_option(args, '--workers', 8)
+    schedule_client(coll._client, workers)
+
+    def delete(href):
+        coll.resource_class(coll._client, href=href).delete()
+        invalidate(href)
+
+    deleted = failed = 0
+    for i, (href, _, error) in enumerate(bounded_map(delete, hrefs, workers), 1):
+        if error is None:
+            deleted += 1
+        else:
+            log.error('Unable to delete {}: {}'.format(href, error))
+            failed += 1
+
+        if i % 100 == 0:
+            log.info('{} of {} resources processed.'.format(i, len(hrefs)))
+
+    log.info('{} resources deleted, {} failed.'.format(deleted, failed))
+    return {'deleted': deleted, 'failed': failed}
 
 
 def delete_resource(coll, args):
     """Delete action: Deletes a Resource.
-    Requires an identifier like --name or --email."""
+    Requires an identifier like --name or --email, or --all-matching to
+    delete everything matching the search options."""
+    if args.get('--all-matching'):
+        return delete_matching_resources(coll, args)
+
     args = _gather_resource_attributes(coll, args)
     attrs = _specialized_query(coll, args, ATTRIBUTE_MAPS)
     attr_name, attr_value = _primary_attribute(coll, attrs)
-    resource = get_resource(coll, attr_name, attr_value)
-    data = get_resource_data(resource)
+    resource, data = find_resource_data(coll, attr_name, attr_value, ttl=index_ttl(args))
     force = args.get('--force', False)
 
-    try:
-        input = raw_input
-    except NameError:
-        pass
+    if not force and args.get('--no-prompt'):
+        raise ValueError('Refusing to delete without --force when prompting is disabled.')
 
     if not force:
         print('Are you sure you want to delete the following resource?')
@@ -299,6 +515,7 @@ def delete_resource(coll, args):
             return
 
     resource.delete()
+    invalidate(resource.href)
     get_logger().info('Resource deleted.')
 
     if force:
@@ -307,210 +524,125 @@ def delete_resource(coll, args):
         return data
 
 
-def init(args):
-    """Downloads and installs a Stormpath sample project for the given platform."""
-    from .main import USER_AGENT
+def _open_records(path):
+    """Opens an import file, '-' meaning stdin."""
+    if path in (None, '-'):
+        return sys.stdin
+    elif PY2:
+        return open(path, 'rb')
 
-    try:
-        auth_args = init_auth(args)
-        client = Client(user_agent=USER_AGENT, **auth_args)
-    except ValueError as ex:
-        get_logger().error(str(ex))
-        exit(1)
-
-    type = args.get('<resource>')
-    name = args.get('<attributes>')
+    return open(path, newline='', encoding='utf-8')
 
-    if name and len(name) > 0:
-        name = name[0].split('name=')[1]
 
-    sample_project = Project.create_from_type(type, name)
-    sample_project.download()
-    sample_project.create_app(client)
-    sample_project.install()
+def _read_records(fd):
+    """Streams records from a CSV file with a header row or a JSONL file
+    (one object per line), detected by the first line."""
+    first = fd.readline()
 
+    if first.lstrip().startswith('{'):
+        for line in chain([first], fd):
+            if line.strip():
+                try:
+                    yield loads(line)
+                except ValueError as e:
+                    yield ValueError('Error parsing JSON: %s' % e)
+    elif first.strip():
+        for record in csv.DictReader(chain([first], fd)):
+            yield record
 
-def run(arg):
-    """Run a Stormpath sample application."""
-    sample_project = Project.detect()
-    sample_project.run()
 
+def _import_attributes(coll, record):
+    """Maps the columns of an import record (ie. given_name, givenName or
+    given-name) to Resource attributes. Returns the attributes and the
+    groups the Resource should be added to."""
+    if isinstance(record, Exception):
+        raise record
 
-def register(args):
-    """Register for Stormpath."""
-    data = {}
+    if not isinstance(record, dict):
+        raise ValueError('Import records must be objects.')
 
-    try:
-        input = raw_input
-    except NameError:
-        pass
+    attr_map = ATTRIBUTE_MAPS[type(coll)]
+    attrs = {}
+    groups = []
 
-    try:
-        if init_auth(args):
-            answer = input(colored('It looks like you already have a Stormpath account. Continue anyway? [y/n]: ', 'green'))
-            if 'n' in answer:
-                exit(1)
-    except ValueError:
-        pass
-
-    # Register the user on Stormpath.
-    done = False
-    while not done:
-        session = Session()
-        resp = session.get('https://api.stormpath.com/register', headers={'accept': 'application/json'})
-
-        data['hpvalue'] = resp.json()['hpvalue']
-        data['csrfToken'] = resp.json()['csrfToken']
-
-        print('To register for Stormpath, please enter your information below.\n')
-        data['givenName'] = input(colored('First Name: ', 'green'))
-        data['surname'] = input(colored('Last Name: ', 'green'))
-        data['companyName'] = input(colored('Company Name: ', 'green'))
-        data['email'] = input(colored('Email: ', 'green'))
-        data['password'] = getpass(colored('Password: ', 'green'))
-        data['confirmedPassword'] = getpass(colored('Confirm Password: ', 'green'))
-
-        resp = session.post('https://api.stormpath.com/register', json=data)
-
-        if resp.status_code == 204:
-            input(colored('\nSuccessfully created your new Stormpath account!  Please open your email inbox and click the account verification link.  Then come back to this window and press enter.', 'yellow'))
-            done = True
-        else:
-            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
-            print('Please try again.')
-
-    # Collect the user's tenant name.
-    done = False
-    while not done:
-        tenant = input(colored('\nPlease enter your Stormpath Tenant name (it can be found on the login page in your browser): ', 'green'))
-        answer = input(colored('Your Tenant name is: {}, is this correct?  [y\\n]: '.format(tenant), 'green'))
-
-        if 'y' in answer:
-            done = True
-
-    # Log the user in.
-    done = False
-    while not done:
-        login_session = Session()
-        resp = login_session.get('https://api.stormpath.com/login')
-
-        parser = pq(resp.text)
-        csrf_token = parser('input[name="csrfToken"]').val()
-        hpvalue = parser('input[name="hpvalue"]').val()
-
-        sleep(3)
-
-        resp = login_session.post('https://api.stormpath.com/login', data={
-            'tenantNameKey': tenant,
-            'email': data['email'],
-            'password': data['password'],
-            'csrfToken': csrf_token,
-            'hpvalue': hpvalue,
-        })
-
-        if resp.status_code != 200:
-            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
-            exit(1)
-
-        done = True
-
-    # Create a new API key pair for this tenant, and download it.
-    done = False
-    while not done:
-        resp = login_session.get('https://api.stormpath.com/v1/accounts/current', headers={'accept': 'application/json'})
-        if resp.status_code != 200:
-            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
-            print('Retrying Account request...')
-
-            sleep(1)
+    for column, value in record.items():
+        if value is None or value == '':
             continue
 
-        account_url = resp.json()['href']
-
-        resp = login_session.post(account_url + '/apiKeys', headers={'accept': 'application/json'}, json={'nocache': True})
-        if resp.status_code != 201:
-            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
-            print('Retrying API key creation...')
-
-            sleep(1)
-            continue
+        name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', column.strip()).lower().replace('-', '_')
+        if name == 'groups':
+            groups.extend(value.split(',') if isinstance(value, string_types) else value)
+        elif name in attr_map and name != 'href':
+            attrs[name] = value
+        else:
+            raise ValueError('Unknown resource attribute: {}'.format(column))
 
-        api_key_url = resp.headers['Location']
+    missing = [n for n in REQUIRED_ATTRIBUTES[type(coll)] if n not in attrs]
+    if missing:
+        raise ValueError('Missing required attributes: {}.'.format(', '.join(sorted(missing))))
 
-        resp = login_session.get(api_key_url, headers={'accept': 'application/json'})
-        if resp.status_code != 200:
-            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
-            print('Retrying API key fetching...')
+    return _check_account_store_mapping(coll, attrs), groups
 
-            sleep(1)
-            continue
 
-        id = resp.json()['id']
-        secret = resp.json()['secret']
+def import_resources(coll, args):
+    """Import action: Creates a Resource for every record of a CSV or JSONL
+    file, concurrently and without prompting. The href or error for every
+    record is written to a JSONL results file."""
+    path = (args.get('<attributes>') or ['-'])[0]
 
-        store_config_file('apiKey.properties', 'apiKey.id = {}\napiKey.secret = {}\n'.format(id, secret))
-        print(colored('\nSuccessfully created API key for Stormpath usage. Saved as: ~/.stormpath/apiKey.properties', 'yellow'))
-        print(colored('You are now setup and ready to use Stormpath!', 'yellow'))
+    results_path = args.get('--results')
+    if not results_path:
+        results_path = 'import.results.jsonl' if path == '-' else path + '.results.jsonl'
 
-        done = True
+    workers = _int_option(args, '--workers', 8)
+    schedule_client(coll._client, workers)
 
+    extra_groups = [g for g in (args.get('--groups') or '').split(',') if g.strip()]
 
-def deploy(args):
-    """Deploy this Stormpath sample application."""
-    project_name = basename(getcwd()) if args['<resource>'] is None else args['<resource>']
+    def create(record):
+        attrs, groups = _import_attributes(coll, record)
+        resource = coll.create(attrs)
 
-    if not which('git'):
-        print(colored('\nERROR: It looks like you don\'t have the Git CLI installed, please set this up first.\n', 'red'))
-        exit(1)
+        groups = extra_groups + groups
+        if groups:
+            # records are already created concurrently
+            group_args = {'--groups': ','.join(groups), '--workers': 1, '--index-ttl': args.get('--index-ttl')}
+            try:
+                _add_resource_to_groups(resource, group_args)
+            except ValueError as ex:
+                return resource.href, str(ex)
 
-    if not which('heroku'):
-        print(colored('\nERROR: It looks like you don\'t have the Heroku CLI installed, please set this up first.\n', 'red'))
-        exit(1)
+        return resource.href, None
 
-    try:
-        input = raw_input
-    except NameError:
-        pass
+    log = get_logger()
+    created = failed = 0
 
+    fd = _open_records(path)
     try:
-        answer = input(colored('Attempting to deploy project: {} to Heroku.  Continue? [y/n]: '.format(project_name), 'green'))
-        if 'y' not in answer:
-            exit(1)
-    except ValueError:
-        pass
-
-    call(['heroku', 'create', project_name])
-    call(['heroku', 'addons:create', 'stormpath'])
-    call(['git', 'push', 'heroku', 'master'])
-
-    print(colored('\nYour Stormpath application has been successfully deployed to Heroku! Run `heroku open` to view it in a browser!', 'yellow'))
-
-
-#: A dictionary of available CLI actions that a user can take.
-AVAILABLE_ACTIONS = {
-    'list': list_resources,
-    'create': create_resource,
-    'update': update_resource,
-    'delete': delete_resource,
-    'set': set_context,
-    'context': show_context,
-    'setup': setup_credentials,
-    'unset': delete_context,
-    'status': show_status,
-    'init': init,
-    'run': run,
-    'register': register,
-    'deploy': deploy,
-}
-
-#: Actions which can be ran locally.
-LOCAL_ACTIONS = ('register', 'setup', 'context', 'unset', 'help', 'deploy', 'init', 'run')
-
-#: The default action to use if none is specified.
-DEFAULT_ACTION = 'list'
-
-#: The action that sets a value.
-SET_ACTION = 'set'
-
-#: The action which provides information about the status of a resource.
-STATUS_ACTION = 'status'
+        with open(results_path, 'w') as out:
+            records = enumerate(_read_records(fd), 1)
+            for (row, record), result, error in bounded_map(lambda item: create(item[1]), records, workers):
+                if error is None:
+                    href, error = result
+                    created += 1
+                else:
+                    href = None
+                    failed += 1
+
+                result = {'row': row}
+                if href:
+                    result['href'] = href
+                if error:
+                    result['error'] = str(error)
+
+                out.write(dumps(result, sort_keys=True))
+                out.write('\n')
+
+                if row % 1000 == 0:
+                    log.debug('{} records processed.'.format(row))
+    finally:
+        if fd is not sys.stdin:
+            fd.close()
+
+    log.info('{} resources imported, {} failed. Results written to {}.'.format(created, failed, results_path))
+    return {'created': created, 'failed': failed, 'results': results_path}
@@ -0,0 +1,93 @@
+"""
+    stormpath_cli.arguments
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Command line parsing with a cached docopt grammar.
+
+    docopt parses the whole usage string into a pattern tree on every run
+    before it looks at the actual arguments. That tree only depends on the
+    usage string, so it is pickled to ~/.stormpath/ once, keyed on the
+    package version, the docopt version and a hash of the usage string, and
+    loaded by later runs instead.
+"""
+
+import pickle
+import sys
+from hashlib import sha1
+
+import docopt
+from docopt import (AnyOptions, Dict, DocoptExit, Option, TokenStream,
+    extras, formal_usage, parse_argv, parse_defaults, parse_pattern, printable_usage)
+
+from . import __version__ as version
+from .output import get_logger
+from .util import get_config_file, store_config_file
+
+
+#: The name of the grammar cache file in the cli config directory.
+GRAMMAR_FILE = 'grammar.pickle'
+
+# Pickled grammars already loaded by this process, by cache key.
+_grammars = {}
+
+
+def _cache_key(doc):
+    digest = sha1(doc.encode('utf-8')).hexdigest()
+    return '{} {} {}'.format(version, docopt.__version__, digest)
+
+
+def compile_grammar(doc):
+    """Parses a docopt usage string the same way docopt does, returning the
+    usage section, the options and the (fixed) pattern tree."""
+    usage = printable_usage(doc)
+    options = parse_defaults(doc)
+    pattern = parse_pattern(formal_usage(usage), options)
+
+    pattern_options = set(pattern.flat(Option))
+    for ao in pattern.flat(AnyOptions):
+        ao.children = list(set(parse_defaults(doc)) - pattern_options)
+
+    return usage, options, pattern.fix()
+
+
+def _load_grammar(doc):
+    """Returns the pickled grammar for ``doc``, from memory, the cache file
+    or by compiling (and caching) it."""
+    key = _cache_key(doc)
+    if key in _grammars:
+        return _grammars[key]
+
+    try:
+        cached_key, data = pickle.loads(get_config_file(GRAMMAR_FILE, binary=True))
+    except Exception:
+        cached_key, data = None, None
+
+    if cached_key != key:
+        data = pickle.dumps(compile_grammar(doc), pickle.HIGHEST_PROTOCOL)
+        try:
+            store_config_file(GRAMMAR_FILE, pickle.dumps((key, data), pickle.HIGHEST_PROTOCOL), binary=True)
+        except (IOError, OSError) as ex:
+            get_logger().debug('Unable to cache the argument grammar: {}'.format(ex))
+
+    _grammars[key] = data
+    return data
+
+
+def parse_arguments(doc, argv=None):
+    """A drop-in replacement for ``docopt(doc, argv)``."""
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Every parse gets its own copy of the grammar, as the returned
+    # arguments share (mutable) default values with the pattern tree.
+    usage, options, pattern = pickle.loads(_load_grammar(doc))
+
+    DocoptExit.usage = usage
+    argv = parse_argv(TokenStream(argv, DocoptExit), list(options), False)
+    extras(True, None, argv, doc)
+
+    matched, left, collected = pattern.match(argv)
+    if matched and left == []:
+        return Dict((a.name, a.value) for a in (pattern.flat() + collected))
+
+    raise DocoptExit()
@@ -0,0 +1,150 @@
+"""
+    stormpath_cli.batch
+    ~~~~~~~~~~~~~~~~~~~
+
+    Runs many CLI commands from a file (or stdin) in a single process, with
+    a shared API client and optionally on a pool of workers.
+
+    Every line is either a regular command line (ie. ``create account -e
+    ...``) or a JSON document: a list of command line arguments, or an
+    object with ``action``, ``resource`` and ``attributes`` keys where all
+    other keys are options (ie. ``{"action": "create", "resource":
+    "account", "email": "..."}``).
+"""
+
+from __future__ import print_function
+
+import json
+import shlex
+import sys
+import types
+
+from .concurrency import bounded_map
+from .output import _project_row, get_logger
+from .shell import parse_command_argv
+
+
+#: Returned for blank lines and comments, which don't get a status line.
+_SKIPPED = object()
+
+def _json_argv(data):
+    """Turns a JSON command into command line arguments."""
+    if isinstance(data, list):
+        return [str(a) for a in data]
+
+    if not isinstance(data, dict):
+        raise ValueError('JSON commands must be lists or objects.')
+
+    data = dict(data)
+    argv = [data.pop('action', ''), data.pop('resource', '')]
+
+    attributes = data.pop('attributes', {})
+    if isinstance(attributes, dict):
+        attributes = ['{}={}'.format(k, v) for k, v in sorted(attributes.items())]
+
+    for name, value in sorted(data.items()):
+        opt = name if name.startswith('-') else '--' + name
+        if value is True:
+            argv.append(opt)
+        elif value not in (None, False):
+            argv.extend([opt, ','.join(value) if isinstance(value, list) else str(value)])
+
+    return [a for a in argv if a] + list(attributes)
+
+
+def parse_batch_line(line, session_args):
+    """Parses one line of a batch file. Returns None for blank lines and
+    comments."""
+    line = line.strip()
+    if line.startswith('[') or line.startswith('{'):
+        try:
+            argv = _json_argv(json.loads(line))
+        except ValueError as ex:
+            raise ValueError('Invalid JSON command: {}'.format(ex))
+    else:
+        argv = shlex.split(line, comments=True)
+
+    try:
+        arguments = parse_command_argv(argv, session_args)
+    except SystemExit as ex:
+        # docopt exits with the usage on invalid command lines
+        raise ValueError(ex.code or 'Invalid command.')
+
+    if arguments is not None:
+        # there's nobody to answer prompts in a batch
+        arguments['--no-prompt'] = True
+
+    return arguments
+
+
+def _read_lines(source):
+    if source in (None, '-'):
+        for line in sys.stdin:
+            yield line
+    else:
+        with open(source) as fd:
+            for line in fd:
+                yield line
+
+
+def _run_line(line, session_args, get_client):
+    from .main import execute_command
+
+    arguments = parse_batch_line(line, session_args)
+    if arguments is None:
+        return _SKIPPED
+
+    if arguments.get('<action>') in ('batch', 'shell'):
+        raise ValueError("The '{}' command can't be used in a batch.".format(arguments['<action>']))
+
+    success, result = execute_command(arguments, get_client=get_client)
+    if not success:
+        raise ValueError('Command failed.')
+
+    show_links = arguments.get('--show-links', False)
+    if isinstance(result, (list, types.GeneratorType)):
+        return [_project_row(r, show_links=show_links) for r in result]
+    elif isinstance(result, dict):
+        return _project_row(result, show_links=show_links)
+
+    return result
+
+
+def run_batch(args, out=None):
+    """Batch action: Runs every command from the file given as resource (or
+    stdin) and writes one JSON status line per command."""
+    from .main import _is_command_error, shared_client_factory
+
+    log = get_logger()
+    out = out or sys.stdout
+    try:
+        workers = int(args.get('--workers') or 1)
+    except ValueError:
+        raise ValueError("Option '--workers' expects a number.")
+
+    # the commands share the clients, so they must allow every worker's requests
+    get_client = shared_client_factory(workers)
+
+    lines = enumerate(_read_lines(args.get('<resource>')), 1)
+    run = lambda item: _run_line(item[1], args, get_client)
+
+    ok = failed = 0
+    for (lineno, line), result, error in bounded_map(run, lines, workers):
+        if result is _SKIPPED:
+            continue
+
+        if error is not None:
+            if not _is_command_error(error):
+                log.debug('Unexpected error', exc_info=error)
+
+            status = dict(line=lineno, status='error', error=str(error))
+            failed += 1
+        else:
+            status = dict(line=lineno, status='ok', result=result)
+            ok += 1
+
+        out.write(json.dumps(status, sort_keys=True, default=str))
+        out.write('\n')
+
+    log.info('{} commands succeeded, {} failed.'.format(ok, failed))
+    return failed == 0
@@ -0,0 +1,94 @@
+"""
+    stormpath_cli.commands
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    The tables of CLI actions and resources. Both are referenced by name and
+    only imported when they're used, so that purely local actions (ie.
+    context, run or deploy) don't pay for importing the Stormpath SDK.
+"""
+
+from importlib import import_module
+
+from .timing import span
+
+
+#: A dictionary of available CLI actions that a user can take, mapped to the
+#: 'module:function' implementing them.
+AVAILABLE_ACTIONS = {
+    'list': 'actions:list_resources',
+    'create': 'actions:create_resource',
+    'update': 'actions:update_resource',
+    'delete': 'actions:delete_resource',
+    'import': 'actions:import_resources',
+    'set': 'context:set_context',
+    'context': 'context:show_context',
+    'setup': 'auth:setup_credentials',
+    'unset': 'context:delete_context',
+    'status': 'status:show_status',
+    'init': 'local:init',
+    'run': 'local:run',
+    'register': 'local:register',
+    'deploy': 'local:deploy',
+    'flush': 'index:flush_index',
+    'shell': 'shell:run_shell',
+    'batch': 'batch:run_batch',
+    'export': 'export:export_tenant',
+    'sync': 'sync:sync_tenant',
+    'migrate': 'migrate:migrate_tenant',
+}
+
+#: A dictionary of available resource types, mapped to the 'module:function'
+#: returning their collection for a client and the CLI arguments.
+AVAILABLE_RESOURCES = {
+    'application': 'resources:get_applications',
+    'applications': 'resources:get_applications',
+    'directory': 'resources:get_directories',
+    'directories': 'resources:get_directories',
+    'account': 'resources:get_accounts',
+    'accounts': 'resources:get_accounts',
+    'group': 'resources:get_groups',
+    'groups': 'resources:get_groups',
+    'mapping': 'resources:get_mappings',
+    'mappings': 'resources:get_mappings',
+}
+
+#: Actions which can be ran locally.
+LOCAL_ACTIONS = ('register', 'setup', 'context', 'unset', 'help', 'deploy', 'init', 'run', 'flush', 'shell', 'batch')
+
+#: The default action to use if none is specified.
+DEFAULT_ACTION = 'list'
+
+#: The action that sets a value.
+SET_ACTION = 'set'
+
+#: The action which provides information about the status of a resource.
+STATUS_ACTION = 'status'
+
+#: The action which takes a file instead of attributes.
+IMPORT_ACTION = 'import'
+
+#: The actions which work on the whole tenant instead of a resource.
+EXPORT_ACTION = 'export'
+SYNC_ACTION = 'sync'
+
+#: The action which copies one tenant into another.
+MIGRATE_ACTION = 'migrate'
+
+#: Actions which don't take a resource type.
+TENANT_ACTIONS = (STATUS_ACTION, EXPORT_ACTION, SYNC_ACTION, MIGRATE_ACTION)
+
+
+def _load(ref):
+    module, func = ref.split(':')
+    with span('imports'):
+        return getattr(import_module('.' + module, __package__), func)
+
+
+def load_action(name):
+    """Imports and returns the function implementing an action."""
+    return _load(AVAILABLE_ACTIONS[name])
+
+
+def load_resource(name):
+    """Imports and returns the function getting a resource collection."""
+    return _load(AVAILABLE_RESOURCES[name])
@@ -0,0 +1,49 @@
+"""
+    stormpath_cli.concurrency
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Helpers for running many API operations concurrently.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _outcome(item, future):
+    try:
+        return item, future.result(), None
+    except Exception as ex:
+        return item, None, ex
+
+
+def bounded_map(func, items, workers=1):
+    """Calls ``func`` for every item on up to ``workers`` threads and yields
+    ``(item, result, error)`` tuples in input order. Items are consumed
+    lazily, with at most twice as many calls in flight as there are
+    workers, so arbitrarily long (ie. streamed) inputs are fine."""
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as ex:
+                yield item, None, ex
+
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    try:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= workers * 2:
+                yield _outcome(*pending.popleft())
+
+        while pending:
+            yield _outcome(*pending.popleft())
+    finally:
+        for item, future in pending:
+            future.cancel()
+
+        executor.shutdown(wait=False)
+
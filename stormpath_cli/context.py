@@ -1,6 +1,3 @@
-from stormpath.resources.application import ApplicationList
-from stormpath.resources.directory import DirectoryList
-
 from .output import get_logger
 from .resources import get_resource
 from .util import get_config_path, get_config_file, store_config_file, delete_config_file
@@ -45,6 +42,9 @@ def _display_context():
 def set_context(collection, args):
     """Set the context to the requested application/directory and
     store it to the context file"""
+    from stormpath.resources.application import ApplicationList
+    from stormpath.resources.directory import DirectoryList
+
     from .actions import _gather_resource_attributes
 
     args = _gather_resource_attributes(collection, args)
@@ -0,0 +1,189 @@
+"""
+    stormpath_cli.export
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Exports a whole tenant (applications, directories, groups, accounts and
+    account store mappings) into gzipped JSONL shards, one Resource per
+    line, exactly as returned by the API.
+
+    Every page is appended to its shard as a separate gzip member, and
+    after each page a checkpoint records where the export is (the
+    collection, the offset of the next page and the size of the shard). An
+    interrupted export continues from the checkpoint: the shard is
+    truncated back to its checkpointed size, dropping anything written
+    after it, and paging resumes at the checkpointed offset. Only one page
+    is held in memory at a time.
+"""
+
+import gzip
+import json
+import os
+from os.path import exists, join
+
+from .output import get_logger
+from .resources import iter_collection_pages
+
+
+#: Tenant collections, exported in this order, followed by the account
+#: store mappings of every application.
+TENANT_COLLECTIONS = ('applications', 'directories', 'groups', 'accounts')
+
+MAPPINGS = 'accountStoreMappings'
+
+#: Where the export is kept, unless given.
+DEFAULT_DIRECTORY = 'stormpath-export'
+
+CHECKPOINT_FILE = 'checkpoint.json'
+
+#: Rows per shard; shards are only switched between pages.
+SHARD_ROWS = 100000
+
+
+def shard_name(collection, number):
+    return '{}-{:05d}.jsonl.gz'.format(collection, number)
+
+
+def read_shards(path, collection):
+    """Yields the rows exported for a collection, shard by shard."""
+    number = 0
+    while exists(join(path, shard_name(collection, number))):
+        with gzip.open(join(path, shard_name(collection, number)), 'rt') as fd:
+            for line in fd:
+                yield json.loads(line)
+
+        number += 1
+
+
+class Checkpoint(object):
+    """The position of an export, saved after every page."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = join(path, CHECKPOINT_FILE)
+
+        self.task = 0
+        self.collection = None
+        self.offset = 0
+        self.shard = 0
+        self.shard_size = 0
+        self.shard_rows = 0
+        self.rows = {}
+        self.done = False
+
+        if exists(self.file):
+            with open(self.file) as fd:
+                self.__dict__.update(json.load(fd))
+
+    def save(self):
+        data = dict((k, v) for k, v in self.__dict__.items() if k not in ('path', 'file'))
+
+        tmp = self.file + '.tmp'
+        with open(tmp, 'w') as fd:
+            json.dump(data, fd, sort_keys=True)
+            fd.flush()
+            os.fsync(fd.fileno())
+
+        os.rename(tmp, self.file)
+
+
+def _write_page(fd, items):
+    """Appends a page to a shard as a gzip member."""
+    member = gzip.GzipFile(fileobj=fd, mode='wb')
+    for item in items:
+        member.write(json.dumps(item, sort_keys=True).encode('utf-8'))
+        member.write(b'\n')
+
+    member.close()
+
+
+def _tasks(client, path):
+    """Yields (collection name, collection) for every collection to export,
+    ie. the tenant collections followed by the mappings of every exported
+    application."""
+    from stormpath.resources.account_store_mapping import AccountStoreMappingList
+
+    for name in TENANT_COLLECTIONS:
+        yield name, getattr(client, name)
+
+    for app in read_shards(path, 'applications'):
+        yield MAPPINGS, AccountStoreMappingList(client, href=app['href'] + '/' + MAPPINGS)
+
+
+def _export_collection(path, checkpoint, name, collection, prefetch):
+    """Exports a collection from the checkpointed offset, saving the
+    checkpoint after every page."""
+    shard = join(path, shard_name(name, checkpoint.shard))
+
+    # anything after the checkpointed size was written after the last
+    # checkpoint, and will be written again
+    fd = open(shard, 'ab')
+    try:
+        fd.truncate(checkpoint.shard_size)
+        fd.seek(checkpoint.shard_size)
+
+        for page in iter_collection_pages(collection, checkpoint.offset, prefetch):
+            items = page.get('items', [])
+            if not items:
+                break
+
+            if checkpoint.shard_rows >= SHARD_ROWS:
+                fd.close()
+                checkpoint.shard += 1
+                checkpoint.shard_size = checkpoint.shard_rows = 0
+                fd = open(join(path, shard_name(name, checkpoint.shard)), 'wb')
+
+            _write_page(fd, items)
+            fd.flush()
+            os.fsync(fd.fileno())
+
+            checkpoint.offset = (page.get('offset') or 0) + len(items)
+            checkpoint.shard_size = fd.tell()
+            checkpoint.shard_rows += len(items)
+            checkpoint.rows[name] = checkpoint.rows.get(name, 0) + len(items)
+            checkpoint.save()
+    finally:
+        fd.close()
+
+
+def export_tenant(client, args):
+    """Export action: Exports every Resource of the tenant into the
+    directory given as resource, resuming an interrupted export there."""
+    from .actions import _int_option
+
+    log = get_logger()
+    path = args.get('<resource>') or DEFAULT_DIRECTORY
+    prefetch = _int_option(args, '--prefetch')
+
+    if not exists(path):
+        os.makedirs(path)
+
+    checkpoint = Checkpoint(path)
+    if checkpoint.done:
+        raise ValueError('The export in {} is already complete.'.format(path))
+
+    if checkpoint.task or checkpoint.offset:
+        log.info('Resuming the export in {}.'.format(path))
+
+    for task, (name, collection) in enumerate(_tasks(client, path)):
+        if task < checkpoint.task:
+            continue
+
+        if task > checkpoint.task:
+            # every collection gets its own shards; the mappings of all
+            # applications share theirs
+            if name != checkpoint.collection:
+                log.info('Exported {} {}.'.format(checkpoint.rows.get(checkpoint.collection, 0), checkpoint.collection))
+                checkpoint.shard = checkpoint.shard_size = checkpoint.shard_rows = 0
+
+            checkpoint.task = task
+            checkpoint.offset = 0
+
+        checkpoint.collection = name
+        _export_collection(path, checkpoint, name, collection, prefetch)
+
+    log.info('Exported {} {}.'.format(checkpoint.rows.get(checkpoint.collection, 0), checkpoint.collection))
+
+    checkpoint.done = True
+    checkpoint.save()
+
+    return dict(checkpoint.rows, directory=path)
@@ -0,0 +1,109 @@
+"""
+    stormpath_cli.index
+    ~~~~~~~~~~~~~~~~~~~
+
+    A local index mapping Resource names/emails to hrefs, so that repeated
+    commands don't have to query the API just to find a Resource by name.
+    Entries are kept in ~/.stormpath/index.json and expire after a TTL.
+"""
+
+from json import dumps, loads
+from threading import Lock
+from time import time
+
+from .output import get_logger
+from .util import delete_config_file, get_config_file, store_config_file
+
+
+#: The name of the index file in the cli config directory.
+INDEX_FILE = 'index.json'
+
+_lock = Lock()
+_index = None
+
+
+def _key(scope, id_name, id_value):
+    return '\t'.join((scope, id_name, id_value))
+
+
+def _load():
+    """Reads the index file once per process."""
+    global _index
+
+    if _index is None:
+        try:
+            _index = loads(get_config_file(INDEX_FILE, '{}'))
+        except ValueError:
+            _index = {}
+
+    return _index
+
+
+def _save(index):
+    now = time()
+    live = dict((k, v) for k, v in index.items() if v[1] > now)
+
+    try:
+        store_config_file(INDEX_FILE, dumps(live))
+    except (IOError, OSError) as ex:
+        # the index is only a cache, so failing to write it isn't fatal
+        get_logger().debug('Unable to update the index: {}'.format(ex))
+
+
+def lookup(scope, id_name, id_value):
+    """Returns the indexed href for a Resource, or None if it isn't indexed
+    or the entry has expired."""
+    with _lock:
+        entry = _load().get(_key(scope, id_name, id_value))
+
+    if entry and entry[1] > time():
+        return entry[0]
+
+
+def store(scope, id_name, id_value, href, ttl):
+    """Adds a Resource href to the index for ``ttl`` seconds."""
+    with _lock:
+        index = _load()
+        index[_key(scope, id_name, id_value)] = (href, time() + ttl)
+        _save(index)
+
+
+def forget(scope, id_name, id_value):
+    """Removes the entry of a single name/email (ie. when it has gone stale)."""
+    with _lock:
+        index = _load()
+        if index.pop(_key(scope, id_name, id_value), None) is not None:
+            _save(index)
+
+
+def invalidate(href):
+    """Removes every entry pointing to the given Resource href."""
+    with _lock:
+        index = _load()
+        keys = [k for k, v in index.items() if v[0] == href]
+        if keys:
+            for k in keys:
+                del index[k]
+
+            _save(index)
+
+
+def clear():
+    """Removes the whole index."""
+    global _index
+
+    with _lock:
+        _index = {}
+        try:
+            delete_config_file(INDEX_FILE)
+        except OSError:
+            return False
+
+    return True
+
+
+def flush_index(args):
+    """Flush action: Clears the local name/href index."""
+    clear()
+    get_logger().info('Index cleared.')
+    return True
@@ -0,0 +1,204 @@
+"""
+    stormpath_cli.local
+    ~~~~~~~~~~~~~~~~~~~
+
+    The actions which run locally: registering for Stormpath, and setting
+    up, running and deploying the sample projects. They're kept apart from
+    the resource actions so that they don't import the Stormpath SDK unless
+    they need it.
+"""
+
+from __future__ import print_function
+
+from getpass import getpass
+from os import getcwd
+from os.path import basename
+from subprocess import call
+from sys import exit
+from time import sleep
+
+from six.moves import input
+
+from .auth import init_auth
+from .output import get_logger
+from .util import store_config_file, which
+
+
+def init(args):
+    """Downloads and installs a Stormpath sample project for the given platform."""
+    from stormpath.client import Client
+
+    from .main import USER_AGENT
+    from .projects import Project
+
+    try:
+        auth_args = init_auth(args)
+        client = Client(user_agent=USER_AGENT, **auth_args)
+    except ValueError as ex:
+        get_logger().error(str(ex))
+        exit(1)
+
+    type = args.get('<resource>')
+    name = args.get('<attributes>')
+
+    if name and len(name) > 0:
+        name = name[0].split('name=')[1]
+
+    sample_project = Project.create_from_type(type, name)
+    sample_project.download()
+    sample_project.create_app(client)
+    sample_project.install()
+
+
+def run(arg):
+    """Run a Stormpath sample application."""
+    from .projects import Project
+
+    sample_project = Project.detect()
+    sample_project.run()
+
+
+def register(args):
+    """Register for Stormpath."""
+    from pyquery import PyQuery as pq
+    from requests import Session
+    from termcolor import colored
+
+    data = {}
+
+    try:
+        if init_auth(args):
+            answer = input(colored('It looks like you already have a Stormpath account. Continue anyway? [y/n]: ', 'green'))
+            if 'n' in answer:
+                exit(1)
+    except ValueError:
+        pass
+
+    # Register the user on Stormpath.
+    done = False
+    while not done:
+        session = Session()
+        resp = session.get('https://api.stormpath.com/register', headers={'accept': 'application/json'})
+
+        data['hpvalue'] = resp.json()['hpvalue']
+        data['csrfToken'] = resp.json()['csrfToken']
+
+        print('To register for Stormpath, please enter your information below.\n')
+        data['givenName'] = input(colored('First Name: ', 'green'))
+        data['surname'] = input(colored('Last Name: ', 'green'))
+        data['companyName'] = input(colored('Company Name: ', 'green'))
+        data['email'] = input(colored('Email: ', 'green'))
+        data['password'] = getpass(colored('Password: ', 'green'))
+        data['confirmedPassword'] = getpass(colored('Confirm Password: ', 'green'))
+
+        resp = session.post('https://api.stormpath.com/register', json=data)
+
+        if resp.status_code == 204:
+            input(colored('\nSuccessfully created your new Stormpath account!  Please open your email inbox and click the account verification link.  Then come back to this window and press enter.', 'yellow'))
+            done = True
+        else:
+            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
+            print('Please try again.')
+
+    # Collect the user's tenant name.
+    done = False
+    while not done:
+        tenant = input(colored('\nPlease enter your Stormpath Tenant name (it can be found on the login page in your browser): ', 'green'))
+        answer = input(colored('Your Tenant name is: {}, is this correct?  [y\\n]: '.format(tenant), 'green'))
+
+        if 'y' in answer:
+            done = True
+
+    # Log the user in.
+    done = False
+    while not done:
+        login_session = Session()
+        resp = login_session.get('https://api.stormpath.com/login')
+
+        parser = pq(resp.text)
+        csrf_token = parser('input[name="csrfToken"]').val()
+        hpvalue = parser('input[name="hpvalue"]').val()
+
+        sleep(3)
+
+        resp = login_session.post('https://api.stormpath.com/login', data={
+            'tenantNameKey': tenant,
+            'email': data['email'],
+            'password': data['password'],
+            'csrfToken': csrf_token,
+            'hpvalue': hpvalue,
+        })
+
+        if resp.status_code != 200:
+            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
+            exit(1)
+
+        done = True
+
+    # Create a new API key pair for this tenant, and download it.
+    done = False
+    while not done:
+        resp = login_session.get('https://api.stormpath.com/v1/accounts/current', headers={'accept': 'application/json'})
+        if resp.status_code != 200:
+            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
+            print('Retrying Account request...')
+
+            sleep(1)
+            continue
+
+        account_url = resp.json()['href']
+
+        resp = login_session.post(account_url + '/apiKeys', headers={'accept': 'application/json'}, json={'nocache': True})
+        if resp.status_code != 201:
+            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
+            print('Retrying API key creation...')
+
+            sleep(1)
+            continue
+
+        api_key_url = resp.headers['Location']
+
+        resp = login_session.get(api_key_url, headers={'accept': 'application/json'})
+        if resp.status_code != 200:
+            print(colored('\nERROR: {}\n'.format(resp.json()['message']), 'red'))
+            print('Retrying API key fetching...')
+
+            sleep(1)
+            continue
+
+        id = resp.json()['id']
+        secret = resp.json()['secret']
+
+        store_config_file('apiKey.properties', 'apiKey.id = {}\napiKey.secret = {}\n'.format(id, secret))
+        print(colored('\nSuccessfully created API key for Stormpath usage. Saved as: ~/.stormpath/apiKey.properties', 'yellow'))
+        print(colored('You are now setup and ready to use Stormpath!', 'yellow'))
+
+        done = True
+
+
+def deploy(args):
+    """Deploy this Stormpath sample application."""
+    from termcolor import colored
+
+    project_name = basename(getcwd()) if args['<resource>'] is None else args['<resource>']
+
+    if not which('git'):
+        print(colored('\nERROR: It looks like you don\'t have the Git CLI installed, please set this up first.\n', 'red'))
+        exit(1)
+
+    if not which('heroku'):
+        print(colored('\nERROR: It looks like you don\'t have the Heroku CLI installed, please set this up first.\n', 'red'))
+        exit(1)
+
+    try:
+        answer = input(colored('Attempting to deploy project: {} to Heroku.  Continue? [y/n]: '.format(project_name), 'green'))
+        if 'y' not in answer:
+            exit(1)
+    except ValueError:
+        pass
+
+    call(['heroku', 'create', project_name])
+    call(['heroku', 'addons:create', 'stormpath'])
+    call(['git', 'push', 'heroku', 'master'])
+
+    print(colored('\nYour Stormpath application has been successfully deployed to Heroku! Run `heroku open` to view it in a browser!', 'yellow'))
@@ -10,14 +10,27 @@ Actions:
     create   Create a resource on Stormpath
     update   Update a resource on Stormpath
     delete   Remove a resource from Stormpath
+    import   Create resources from a CSV or JSONL file (or stdin, '-')
     set      Set context for user/group actions
     context  Show currently used context for user/group actions
     setup    Set up credentials for accessing the Stormpath API
     unset    Deletes the current context
+    flush    Clears the local index of Resource names
     status   Prints out authentication info and context
     deploy   Deploy your Stormpath Application to Heroku.
     run      Run a Stormpath Application.
     init     Initialize a new Stormpath sample Application.
+    shell    Run commands interactively, reusing one API connection.
+    batch    Run the commands listed in a file (or stdin, '-') in one process.
+    export   Export the whole tenant into gzipped JSONL shards in <resource>
+             (default stormpath-export), resuming an interrupted export.
+    sync     Update the tenant snapshot in <resource> (default stormpath-snapshot.db)
+             with the resources changed since the last sync, writing them to --results.
+             Deletions are found by comparing collection sizes; one racing with a
+             create during the sync is only reported by the next sync.
+    migrate  Copy the tenant of --from-apikeyfile into the one of --to-apikeyfile,
+             journaling the new hrefs in <resource> (default stormpath-migration.jsonl)
+             so that an interrupted migration can be resumed.
 
 Resources:
     application  Application Resource
@@ -28,7 +41,13 @@ Resources:
 
 Options:
     -h, --help                              Lists help
-    -v, --verbose                           Show debugging info
+    -v, --verbose                           Show debugging info, including API request and throttling counters
+    --profile                               Print how long each phase of the command took (imports, docopt,
+                                            init_auth, client, http, json, command, output) to stderr
+    --profile-dump <file>                   Like --profile, and save cProfile statistics to <file> for pstats
+    --trace                                 Print the number of API requests, bytes and latency percentiles per
+                                            endpoint to stderr
+    --trace-file <file>                     Like --trace, and write every request to <file> as JSON lines
 
     -a <key:secret>, --apikey <key:secret>  Authenticate with provided key and secret
     -k <file>, --apikeyfile <file>          Use credentials from <file>
@@ -36,6 +55,15 @@ Options:
     -H, --show-headers                      If in TSV mode, show column headers in the first line
     --is-default-account-store <bool>       Used for adding mappings to current application.
     --is-default-group-store <bool>         Used for adding mappings to current application.
+    --index-ttl <seconds>                   Seconds to reuse locally indexed name lookups, 0 disables the index [default: 0].
+                                            Indexed -A/-D contexts aren't checked again until they expire.
+    --no-prompt                             Fail instead of asking for missing attributes or confirmation.
+    -w <n>, --workers <n>                   Number of commands to run concurrently in batch mode (default 1, as
+                                            commands can depend on earlier ones), or requests to make
+                                            concurrently in bulk imports/updates/deletes (default 8).
+    --results <file>                        Where import writes the href or error for every record
+                                            (defaults to <file>.results.jsonl), and sync its change
+                                            feed (defaults to <snapshot>.changes.jsonl).
 
 List/search/create options:
     -n <name>, --name <name>                Resource name. Valid for applications, directories, groups.
@@ -51,6 +79,13 @@ List/search/create options:
     -G <group>..., --groups <group>...      Groups to which to add a resource. Valid for accounts.
     -R, --create-directory                  When creating an application create the directory. Valid for applications.
     --href <href>                           When referencing already created Resources (ie. for update)
+    --prefetch <pages>                      Number of collection pages to request ahead while listing [default: 4].
+    --expand <links>                        Expand linked resources into the output (ie. customData,groups(limit:25))
+                                            instead of requesting them for every resource.
+    --fields <names>                        Only output these attributes (ie. email,status,href). Links are only
+                                            shown with --show-links or --expand.
+    --limit <n>                             List at most <n> resources, without requesting any pages past them.
+    --offset <n>                            Skip the first <n> resources when listing.
 
 Init options:
     <sample-type> [<sample-name>]           When initializing a new Stormpath project, supply the type and name.
@@ -64,6 +99,18 @@ options require an exact match.
 Deletion flags:
     -F, --force                             Don't ask confirmation before deleting the resource. Valid for all resources.
 
+Bulk update/delete options:
+    --all-matching                          Update or delete every resource matching the search options (ie. --query
+                                            or --status) instead of a single one, asking once with the number of
+                                            matches. Updates set the name=value attributes (ie. status=DISABLED) and
+                                            skip resources which already have those values. A search option is
+                                            required, and account store mappings can't be searched.
+
+Migration options:
+    --from-apikeyfile <file>                Credentials of the tenant to copy resources from
+    --to-apikeyfile <file>                  Credentials of the tenant to copy resources to. Migrated accounts
+                                            get the password given with --password, which is required.
+
 Specifying the application or directory context (for accounts and groups):
     -A <app>, --in-application <app>        Set context to application <app>
     -D <dir>, --in-directory <dir>          Set context to directory <dir>
@@ -71,26 +118,32 @@ Specifying the application or directory context (for accounts and groups):
 Use json input:
     -j <json>, --json <json>                Overrides the flags and uses json for input. Valid for all resources.
     --output-json                           Overrides the default human readable output to json. Valid for all resources
+    --output-ndjson                         Output newline delimited json, one resource per line. Valid for all resources
+    --output-csv                            Output comma separated values instead of the default. Valid for all resources
 
 For -A and -D options, the application and directory can be specified by their
 name or URL.
 """
 
+# imported first, so that it can time the other imports
+from stormpath_cli import timing
+
+import sys
 import types
 from sys import version_info as vi
+from threading import Lock
+from time import time
 
-from docopt import docopt
-from stormpath.client import Client
-from stormpath.error import Error as StormpathError
-
-from stormpath_cli.actions import AVAILABLE_ACTIONS, LOCAL_ACTIONS
+from stormpath_cli.arguments import parse_arguments
 from stormpath_cli.auth import init_auth
+from stormpath_cli.commands import (AVAILABLE_ACTIONS, AVAILABLE_RESOURCES,
+    LOCAL_ACTIONS, MIGRATE_ACTION, SET_ACTION, STATUS_ACTION, TENANT_ACTIONS,
+    load_action, load_resource)
 from stormpath_cli.context import get_context_dict
-from stormpath_cli.resources import AVAILABLE_RESOURCES
-from stormpath_cli.output import output, setup_output
+from stormpath_cli.output import get_logger, output, setup_output
+from stormpath_cli import trace
 from stormpath_cli.util import (find_non_dash_arguments_and_default_action,
     check_primary_identifier_without_flags, properly_support_boolean_values)
-from stormpath_cli.actions import SET_ACTION, STATUS_ACTION
 
 from . import __version__ as version
 
@@ -98,80 +151,205 @@ from . import __version__ as version
 USER_AGENT = 'stormpath-cli/{} (python {})'.format(version, '{}.{}.{}'.format(vi.major, vi.minor, vi.micro))
 
 
-def main():
-    arguments = docopt(__doc__)
+def create_client(arguments):
+    """Creates an API client from the credentials in the CLI arguments."""
+    with timing.span('imports'):
+        from stormpath.client import Client
+
+        from stormpath_cli.scheduler import schedule_client
+
+    with timing.span('init_auth'):
+        auth_args = init_auth(arguments)
+
+    with timing.span('client'):
+        client = Client(user_agent=USER_AGENT, **auth_args)
+
+        # retries throttled requests, and bulk actions raise its concurrency
+        schedule_client(client)
+
+    if timing.enabled():
+        timing.instrument_json()
+
+    if trace.enabled():
+        trace.trace_client(client)
+
+    return client
+
+
+def shared_client_factory(concurrency=1):
+    """Returns a ``get_client`` function for run_command which creates one
+    client per set of credentials and then keeps reusing it (along with its
+    HTTP connection pool), allowing ``concurrency`` requests in flight."""
+    from stormpath_cli.scheduler import schedule_client
+
+    clients = {}
+    lock = Lock()
+
+    def get_client(arguments):
+        key = tuple(sorted(init_auth(arguments).items()))
+        with lock:
+            if key not in clients:
+                clients[key] = create_client(arguments)
+                schedule_client(clients[key], concurrency)
+
+            return clients[key]
+
+    return get_client
+
+
+def _is_command_error(ex):
+    """Invalid commands (ValueError) and API errors are reported to the
+    user, anything else is a bug. The SDK's error class is only checked
+    when the SDK has actually been imported."""
+    if isinstance(ex, ValueError):
+        return True
+
+    error = sys.modules.get('stormpath.error')
+    return error is not None and isinstance(ex, error.Error)
+
+
+def _migration_clients(arguments, get_client):
+    """Creates the clients of the tenants a migration copies from and to."""
+    clients = []
+    for option in ('--from-apikeyfile', '--to-apikeyfile'):
+        if not arguments.get(option):
+            raise ValueError("Option '{}' is required to migrate. Please see 'stormpath --help'".format(option))
+
+        clients.append(get_client(dict(arguments, **{'--apikey': None, '--apikeyfile': arguments[option]})))
+
+    return clients
+
+
+def execute_command(arguments, get_client=create_client):
+    """Validates and runs a single parsed command line without printing
+    anything. Returns a ``(success, result)`` tuple, where ``result`` is the
+    data returned by the action (ie. a generator when listing). Invalid
+    commands raise ValueError; failing actions raise ValueError or the
+    SDK's Error. ``get_client`` provides the API client for the arguments,
+    so callers running many commands can share one client."""
     action = arguments.get('<action>')
     resource = arguments.get('<resource>')
 
-    log = setup_output(arguments.get('--verbose'))
-
     arguments.update(get_context_dict())
     arguments, resource, action = find_non_dash_arguments_and_default_action(arguments, resource, action)
     arguments = properly_support_boolean_values(arguments)
     arguments = check_primary_identifier_without_flags(arguments, resource, action)
 
-    if not action:
-        log.error(__doc__.strip('\n'))
-        return -1
-
-    if action == 'help':
-        log.error(__doc__.strip('\n'))
-        return -1
+    if not action or action == 'help':
+        raise ValueError(__doc__.strip('\n'))
 
     if action not in AVAILABLE_ACTIONS:
-        log.error("Unknown action '{}'. See 'stormpath --help' for list of available actions.".format(action))
-        return -1
+        raise ValueError("Unknown action '{}'. See 'stormpath --help' for list of available actions.".format(action))
 
     if action in LOCAL_ACTIONS:
-        return 0 if AVAILABLE_ACTIONS[action](arguments) else -1
+        return load_action(action)(arguments), None
 
-    if not resource and action != STATUS_ACTION:
+    if not resource and action not in TENANT_ACTIONS:
         if action == SET_ACTION:
-            log.error("A resource type is required. Available resources for the set command are: application, directory. Please see 'stormpath --help'")
-            return -1
+            raise ValueError("A resource type is required. Available resources for the set command are: application, directory. Please see 'stormpath --help'")
 
-        log.error("A resource type is required. Available resources: {}. Please see 'stormpath --help'".format(', '.join(sorted(AVAILABLE_RESOURCES.keys()))))
-        return -1
+        raise ValueError("A resource type is required. Available resources: {}. Please see 'stormpath --help'".format(', '.join(sorted(AVAILABLE_RESOURCES.keys()))))
 
-    if resource not in AVAILABLE_RESOURCES and action != STATUS_ACTION:
-        log.error("Unknown resource type '{}'. See 'stormpath --help' for list of available resource types.".format(resource))
-        return -1
+    if resource not in AVAILABLE_RESOURCES and action not in TENANT_ACTIONS:
+        raise ValueError("Unknown resource type '{}'. See 'stormpath --help' for list of available resource types.".format(resource))
 
-    try:
-        auth_args = init_auth(arguments)
-        client = Client(user_agent=USER_AGENT, **auth_args)
-    except ValueError as ex:
-        log.error(str(ex))
-        return -1
+    if action == MIGRATE_ACTION:
+        source, target = _migration_clients(arguments, get_client)
+        return True, load_action(action)(source, target, arguments)
+
+    client = get_client(arguments)
 
     if action == STATUS_ACTION:
-        return 0 if AVAILABLE_ACTIONS[action](client, arguments) else -1
+        return load_action(action)(client, arguments), None
+
+    if action in TENANT_ACTIONS:
+        return True, load_action(action)(client, arguments)
+
+    res = load_resource(resource)(client, arguments)
+    return True, load_action(action)(res, arguments)
+
+
+def run_command(arguments, get_client=create_client):
+    """Runs a single parsed command line, prints its result and returns
+    the exit code."""
+    log = get_logger()
 
     try:
-        res = AVAILABLE_RESOURCES[resource](client, arguments)
-    except ValueError as ex:
+        with timing.span('command'):
+            success, result = execute_command(arguments, get_client=get_client)
+
+        # Generators (ie. listings) only talk to the API while being
+        # consumed, so errors can surface during output as well.
+        if result is not None and (
+                isinstance(result, list) or
+                isinstance(result, dict) or
+                isinstance(result, types.GeneratorType)):
+            with timing.span('output'):
+                output(
+                    result, show_links=arguments.get('--show-links', False),
+                    show_headers=arguments.get('--show-headers', False),
+                    output_json=arguments.get('--output-json', False),
+                    output_ndjson=arguments.get('--output-ndjson', False),
+                    output_csv=arguments.get('--output-csv', False),
+                    expand=arguments.get('--expand'))
+    except Exception as ex:
+        if not _is_command_error(ex):
+            raise
+
         log.error(str(ex))
         return -1
 
-    act = AVAILABLE_ACTIONS[action]
+    return 0 if success else -1
+
+
+def _log_request_stats():
+    """Logs the counters of the request scheduler (visible with --verbose),
+    if any API requests were made."""
+    if 'stormpath_cli.scheduler' in sys.modules:
+        from stormpath_cli.scheduler import get_scheduler
+
+        get_logger().debug('API requests: {}'.format(get_scheduler().summary()))
+
+
+def main():
+    start = time()
+    arguments = parse_arguments(__doc__)
+    parsed = time()
+
+    setup_output(arguments.get('--verbose'))
+
+    dump = arguments.get('--profile-dump')
+    profile = arguments.get('--profile') or dump
+    if profile:
+        timing.enable()
+        timing.add('imports', start - timing.STARTED)
+        timing.add('docopt', parsed - start)
+
+    tracing = arguments.get('--trace') or arguments.get('--trace-file')
+    if tracing:
+        trace.enable(arguments.get('--trace-file'))
+
+    if dump:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
 
     try:
-        result = act(res, arguments)
-    except (StormpathError, ValueError) as ex:
-        log.error(str(ex))
-        return -1
+        return run_command(arguments)
+    finally:
+        if dump:
+            profiler.disable()
+            profiler.dump_stats(dump)
+
+        _log_request_stats()
+
+        if profile:
+            timing.report()
 
-    if result is not None and (
-            isinstance(result, list) or
-            isinstance(result, dict) or
-            isinstance(result, types.GeneratorType)):
-        output(
-            result, show_links=arguments.get('--show-links', False),
-            show_headers=arguments.get('--show-headers', False),
-            output_json=arguments.get('--output-json', False))
-    return 0
+        if tracing:
+            trace.report()
 
 
 if __name__ == '__main__':
-    import sys
     sys.exit(main())
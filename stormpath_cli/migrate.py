@@ -0,0 +1,299 @@
+"""
+    stormpath_cli.migrate
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Copies the Resources of one tenant into another, one stage per
+    collection: applications, directories, groups, accounts, group
+    memberships and account store mappings. The stages run in that order,
+    so every Resource is created after the ones it links to.
+
+    A stage is a streaming pipeline: the collection is read from the
+    source tenant page by page (prefetching), the links of every Resource
+    are remapped to the target tenant, and the Resources are created on a
+    bounded pool of workers. Applications and directories which already
+    exist in the target tenant (by name) are reused, and so are the groups
+    (by name), accounts (by email), group memberships and account store
+    mappings already in them.
+
+    The href every Resource got in the target tenant is appended to a
+    journal as soon as it's created. Running the migration again with the
+    same journal skips everything already migrated, so an interrupted (or
+    partly failed) migration can be resumed.
+
+    Passwords can't be read from the API, but it requires one to create an
+    account; migrated accounts get the one given with --password.
+"""
+
+import json
+from itertools import chain
+from os.path import exists
+
+from stormpath.resources.account import AccountList
+from stormpath.resources.account_store_mapping import AccountStoreMappingList
+from stormpath.resources.group import GroupList
+from stormpath.resources.group_membership import GroupMembershipList
+
+from .concurrency import bounded_map
+from .output import get_logger
+from .resources import get_collection_page, iter_collection_data
+from .scheduler import schedule_client
+
+
+#: Where the journal is kept, unless given.
+DEFAULT_JOURNAL = 'stormpath-migration.jsonl'
+
+#: The stages of a migration, in dependency order.
+STAGES = ('applications', 'directories', 'groups', 'accounts', 'groupMemberships', 'accountStoreMappings')
+
+#: Attributes copied as they are, per stage.
+ATTRIBUTES = {
+    'applications': ('name', 'description', 'status'),
+    'directories': ('name', 'description', 'status'),
+    'groups': ('name', 'description', 'status'),
+    'accounts': ('username', 'email', 'givenName', 'middleName', 'surname', 'status'),
+    'groupMemberships': (),
+    'accountStoreMappings': ('listIndex', 'isDefaultAccountStore', 'isDefaultGroupStore'),
+}
+
+#: Links remapped to the target tenant, per stage.
+LINKS = {
+    'groupMemberships': ('account', 'group'),
+    'accountStoreMappings': ('application', 'accountStore'),
+}
+
+#: Stages whose Resources are reused when the target has one of the same name.
+REUSED_BY_NAME = ('applications', 'directories')
+
+
+class Journal(object):
+    """The hrefs the Resources of the source tenant got in the target
+    tenant, kept in a JSONL file which is appended to as they're
+    created."""
+
+    def __init__(self, path):
+        self.hrefs = {}
+        self.sources = dict((stage, []) for stage in STAGES)
+        self.reused = set()
+
+        line = ''
+        if exists(path):
+            with open(path) as fd:
+                for line in fd:
+                    try:
+                        self._add(json.loads(line))
+                    except ValueError:
+                        # the last line of an interrupted migration
+                        pass
+
+        self.fd = open(path, 'a')
+        if line and not line.endswith('\n'):
+            self.fd.write('\n')
+
+    def _add(self, entry):
+        if entry.get('target'):
+            self.hrefs[entry['source']] = entry['target']
+            self.sources[entry['stage']].append(entry['source'])
+
+        if entry.get('reused'):
+            self.reused.add(entry['target'])
+
+    def record(self, stage, source, target=None, error=None, reused=False):
+        entry = {'stage': stage, 'source': source}
+        if target:
+            entry['target'] = target
+        if error:
+            entry['error'] = error
+        if reused:
+            entry['reused'] = True
+
+        self.fd.write(json.dumps(entry, sort_keys=True))
+        self.fd.write('\n')
+        self.fd.flush()
+
+        self._add(entry)
+
+    def reused_targets(self, stage):
+        """Gets the target hrefs of the Resources of a stage which existed in
+        the target tenant before the migration."""
+        targets = (self.hrefs[href] for href in self.sources[stage])
+        return [href for href in targets if href in self.reused]
+
+    def target(self, href):
+        """Gets the target href of a migrated Resource."""
+        try:
+            return self.hrefs[href]
+        except KeyError:
+            raise ValueError("Depends on {}, which hasn't been migrated.".format(href))
+
+    def close(self):
+        self.fd.close()
+
+
+def _read(stage, source, journal, prefetch):
+    """Yields the Resources of a stage from the source tenant. Memberships
+    and mappings are read from the groups and applications migrated in the
+    earlier stages."""
+    if stage == 'groupMemberships':
+        return chain.from_iterable(
+            iter_collection_data(GroupMembershipList(source, href=href + '/accountMemberships'), prefetch)
+            for href in journal.sources['groups'])
+
+    if stage == 'accountStoreMappings':
+        return chain.from_iterable(
+            iter_collection_data(AccountStoreMappingList(source, href=href + '/accountStoreMappings'), prefetch)
+            for href in journal.sources['applications'])
+
+    return iter_collection_data(getattr(source, stage), prefetch)
+
+
+def _parent(stage, target, item, journal):
+    """Gets the href of the collection a Resource is created in."""
+    if stage in ('groups', 'accounts'):
+        return journal.target(item['directory']['href']) + '/' + stage
+
+    if stage == 'groupMemberships':
+        return target.group_memberships.href
+
+    if stage == 'accountStoreMappings':
+        return target.account_store_mappings.href
+
+    return getattr(target, stage).href
+
+
+def _data(stage, item, journal, password):
+    """Gets the data a Resource is created with in the target tenant."""
+    data = dict((name, item[name]) for name in ATTRIBUTES[stage] if item.get(name) is not None)
+    for link in LINKS.get(stage, ()):
+        data[link] = {'href': journal.target(item[link]['href'])}
+
+    if stage == 'accounts' and password:
+        data['password'] = password
+
+    return data
+
+
+def _existing_key(stage, item, journal):
+    """Identifies a Resource of the source tenant among the existing ones of
+    the target tenant (see :func:`_existing`), or returns None if it can't
+    be there."""
+    if stage in REUSED_BY_NAME:
+        return item.get('name')
+
+    if stage == 'groups':
+        return journal.target(item['directory']['href']), item.get('name')
+
+    if stage == 'accounts' and item.get('email'):
+        return journal.target(item['directory']['href']), item['email'].lower()
+
+    if stage == 'groupMemberships':
+        return journal.target(item['group']['href']), journal.target(item['account']['href'])
+
+    if stage == 'accountStoreMappings':
+        return journal.target(item['application']['href']), journal.target(item['accountStore']['href'])
+
+
+def _existing(stage, target, journal):
+    """Gets the hrefs of the Resources a stage reuses from the target
+    tenant: applications and directories by name, and the groups,
+    accounts, memberships and mappings already in the reused directories,
+    groups and applications."""
+    if stage in REUSED_BY_NAME:
+        return dict((item.get('name'), item['href']) for item in iter_collection_data(getattr(target, stage)))
+
+    existing = {}
+    if stage == 'groups':
+        for href in journal.reused_targets('directories'):
+            for item in iter_collection_data(GroupList(target, href=href + '/groups')):
+                existing[href, item.get('name')] = item['href']
+
+    if stage == 'accounts':
+        for href in journal.reused_targets('directories'):
+            for item in iter_collection_data(AccountList(target, href=href + '/accounts')):
+                existing[href, item['email'].lower()] = item['href']
+
+    if stage == 'groupMemberships':
+        for href in journal.reused_targets('groups'):
+            for item in iter_collection_data(GroupMembershipList(target, href=href + '/accountMemberships')):
+                existing[href, item['account']['href']] = item['href']
+
+    if stage == 'accountStoreMappings':
+        for href in journal.reused_targets('applications'):
+            for item in iter_collection_data(AccountStoreMappingList(target, href=href + '/accountStoreMappings')):
+                existing[href, item['accountStore']['href']] = item['href']
+
+    return existing
+
+
+def _pending(items, journal, counts):
+    """Skips the Resources migrated before."""
+    for item in items:
+        if item['href'] in journal.hrefs:
+            counts['skipped'] += 1
+        else:
+            yield item
+
+
+def _migrate_stage(stage, source, target, journal, args):
+    from .actions import _int_option
+
+    workers = _int_option(args, '--workers', 8)
+    prefetch = _int_option(args, '--prefetch')
+    password = args.get('--password')
+    store = target.data_store
+
+    existing = _existing(stage, target, journal)
+
+    def create(item):
+        href = existing.get(_existing_key(stage, item, journal))
+        if href:
+            return href, True
+
+        data = _data(stage, item, journal, password)
+        return store.create_resource(_parent(stage, target, item, journal), data)['href'], False
+
+    counts = {'migrated': 0, 'skipped': 0, 'failed': 0}
+    items = _pending(_read(stage, source, journal, prefetch), journal, counts)
+
+    for item, result, error in bounded_map(create, items, workers):
+        if error is None:
+            href, reused = result
+            journal.record(stage, item['href'], target=href, reused=reused)
+            counts['migrated'] += 1
+        else:
+            journal.record(stage, item['href'], error=str(error))
+            counts['failed'] += 1
+
+    return counts
+
+
+def migrate_tenant(source, target, args):
+    """Migrate action: Copies the Resources of the source tenant into the
+    target tenant, journaling them in the file given as resource."""
+    from .actions import _int_option
+
+    log = get_logger()
+    path = args.get('<resource>') or DEFAULT_JOURNAL
+
+    if not args.get('--password') and get_collection_page(source.accounts, 0, 1).get('size'):
+        raise ValueError("Option '--password' is required to migrate accounts, the API requires one to create them.")
+
+    schedule_client(target, _int_option(args, '--workers', 8))
+
+    totals = {'migrated': 0, 'skipped': 0, 'failed': 0}
+    journal = Journal(path)
+    try:
+        for stage in STAGES:
+            counts = _migrate_stage(stage, source, target, journal, args)
+            log.info('{}: {} migrated, {} already migrated, {} failed.'.format(
+                stage, counts['migrated'], counts['skipped'], counts['failed']))
+
+            for name, count in counts.items():
+                totals[name] += count
+    finally:
+        journal.close()
+
+    if totals['failed']:
+        log.warning('{} resources failed to migrate, see {}. Run the migration again to retry them.'.format(
+            totals['failed'], path))
+
+    return dict(totals, journal=path)
@@ -1,46 +1,58 @@
 import collections
 import types
-from copy import deepcopy
 from itertools import repeat
 import json
+import re
 import six
 import sys
 from sys import stdout
 import logging
 
 
-def _remove_links(data):
+#: Attributes that link to other resources even when they aren't expanded
+#: into a nested object (ie. when they're null).
+LINK_ATTRIBUTES = ('defaultAccountStoreMapping', 'defaultGroupStoreMapping')
+
+
+def expanded_attributes(expand):
+    """Gets the names of the links expanded by an --expand value (ie.
+    ('customData', 'groups') for 'customData,groups(offset:0,limit:25)')."""
+    return tuple(re.findall(r'(\w+)(?:\([^)]*\))?', expand or ''))
+
+
+def _project_row(data, show_links=False, expanded=()):
+    """Builds the output row for a single resource in one pass. Nested/linked
+    resources are either dropped or replaced by their href, unless they were
+    ``expanded``; nothing else is copied, so the row shares its values with
+    the original data."""
+    if show_links:
+        return dict((k, v.get('href') if isinstance(v, dict) and k not in expanded else v) for k, v in data.items())
+
+    return dict((k, v) for k, v in data.items() if not (isinstance(v, dict) or k in LINK_ATTRIBUTES) or k in expanded)
+
+
+def _remove_links(data, expanded=()):
     """Removes nested/linked resources from the data output."""
     if not isinstance(data, list):
         data = [data]
 
-    d2 = deepcopy(data)
-    for i, el in enumerate(data):
-        for k, v in el.items():
-            if isinstance(v, dict) or k == 'defaultAccountStoreMapping' or k == 'defaultGroupStoreMapping':
-                del d2[i][k]
-
-    return d2
+    return [_project_row(el, expanded=expanded) for el in data]
 
 
-def _show_links(data):
+def _show_links(data, expanded=()):
     """Extracts hrefs from nested/linked resources from the data output."""
     if not isinstance(data, list):
         data = [data]
 
-    d2 = deepcopy(data)
-    for i, el in enumerate(data):
-        for k, v in el.items():
-            if isinstance(v, dict):
-                d2[i][k] = d2[i][k].get('href')
-
-    return d2
+    return [_project_row(el, show_links=True, expanded=expanded) for el in data]
 
 
 def _format_row(data, key, max_indent):
     """Helper function used for printing a human readable and
     nicely aligned output"""
     d = data[key] if data[key] else 'null'
+    if isinstance(d, (dict, list)):
+        d = json.dumps(d, sort_keys=True)
     spacing = max_indent - len(key)
     spaces = ''.join(repeat(' ', spacing))
     row_repr = '{}: {}{}\n'.format(key, spaces, d)
@@ -88,53 +100,122 @@ def _output_to_tty_json(data, out=stdout):
     out.write('\n')
 
 
-def _output_tsv(data, show_headers, out=stdout):
-    """Helper function for printing tab separates values to the output.
-    Used by default when CLI output is piped"""
-    if not isinstance(data, list):
-        data = [data]
-
-    if not len(data):
-        return
+def _output_json_stream(data, out=stdout):
+    """Helper function for printing a JSON array one element at a time.
+    The result is identical to _output_to_tty_json, but resources are
+    written as soon as they are available instead of all at the end."""
+    count = 0
+    for item in data:
+        out.write(',\n  ' if count else '[\n  ')
+        out.write(json.dumps(item, indent=2, sort_keys=True).replace('\n', '\n  '))
+        count += 1
 
-    keys = sorted(data[0].keys())
+    out.write('\n]\n' if count else '[]\n')
+    return count
 
-    if show_headers:
-        if six.PY3:
-            d = '\t'.join(keys)
-        else:
-            d = '\t'.join(keys).encode('utf-8')
 
-        out.write(d)
+def _output_ndjson(data, out=stdout):
+    """Helper function for printing newline delimited JSON, one resource
+    per line."""
+    count = 0
+    for item in data:
+        out.write(json.dumps(item, sort_keys=True))
         out.write('\n')
+        count += 1
 
-    def force_text(val):
-        # if we're including links in TSV mode, we're only interested in href
-        if isinstance(val, dict) and 'href' in val:
-            return val['href']
-        elif val is None:
-            return ''
-        else:
-            return str(val)
+    return count
 
-    for row in data:
-        output_row = [force_text(row[key]) for key in keys]
-        if six.PY3:
-            d = '\t'.join(output_row)
-        else:
-            d = '\t'.join(output_row).encode('utf-8')
 
-        out.write(d)
-        out.write('\n')
+def _force_text(val):
+    """Formats a single TSV/CSV value."""
+    # if we're including links in TSV mode, we're only interested in href,
+    # but expanded resources are written out whole
+    if isinstance(val, dict) and list(val) == ['href']:
+        return val['href']
+    elif isinstance(val, (dict, list)):
+        return json.dumps(val, sort_keys=True)
+    elif val is None:
+        return ''
+    else:
+        return str(val)
+
+
+class TsvWriter(object):
+    """Writes resources as tab separated values.
+
+    The columns are fixed by the first resource written, so the header is
+    only written once per stream, and lines are collected into a buffer
+    which is written out every ``buffer_rows`` rows (and on flush)."""
+
+    delimiter = '\t'
+
+    def __init__(self, show_headers=False, out=stdout, buffer_rows=500):
+        self.show_headers = show_headers
+        self.out = out
+        self.buffer_rows = buffer_rows
+        self.keys = None
+        self.count = 0
+        self._buffer = []
+
+    def _line(self, values):
+        d = self.delimiter.join(values) + '\n'
+        return d if six.PY3 else d.encode('utf-8')
 
+    def write(self, row):
+        if self.keys is None:
+            self.keys = sorted(row.keys())
+            if self.show_headers:
+                self._buffer.append(self._line(self.keys))
 
-def _output(data, show_links=False, show_headers=False, output_json=False):
+        self._buffer.append(self._line([_force_text(row.get(key)) for key in self.keys]))
+        self.count += 1
+
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.out.write(''.join(self._buffer))
+            self._buffer = []
+
+
+class CsvWriter(TsvWriter):
+    """Writes resources as comma separated values, quoting values where
+    needed (RFC 4180)."""
+
+    delimiter = ','
+
+    def _quote(self, value):
+        if any(c in value for c in ',"\r\n'):
+            return '"{}"'.format(value.replace('"', '""'))
+
+        return value
+
+    def _line(self, values):
+        return super(CsvWriter, self)._line([self._quote(v) for v in values])
+
+
+def _output_tsv(data, show_headers, out=stdout):
+    """Helper function for printing tab separates values to the output.
+    Used by default when CLI output is piped"""
+    if not isinstance(data, list):
+        data = [data]
+
+    writer = TsvWriter(show_headers=show_headers, out=out)
+    try:
+        for row in data:
+            writer.write(row)
+    finally:
+        writer.flush()
+
+
+def _output(data, show_links=False, show_headers=False, output_json=False, expanded=()):
     """Output function used for printing to stdout. It will invoke the correct
     helper output function (ie. human readable/json/tsv)"""
     if not show_links:
-        data = _remove_links(data)
+        data = _remove_links(data, expanded)
     else:
-        data = _show_links(data)
+        data = _show_links(data, expanded)
 
     if output_json:
         _output_to_tty_json(data)
@@ -144,33 +225,66 @@ def _output(data, show_links=False, show_headers=False, output_json=False):
         _output_tsv(data, show_headers=show_headers)
 
 
-def output(data, show_links=False, show_headers=False, output_json=False):
+def output(data, show_links=False, show_headers=False, output_json=False, output_ndjson=False, output_csv=False,
+        expand=None):
     """Main output function used for printing to stdout. It will
     invoke helper output function using generator or list and output
-    total number of Resources if needed."""
+    total number of Resources if needed. Links expanded with ``expand``
+    (the --expand value) are kept in the output."""
+    expanded = expanded_attributes(expand)
+
+    # JSON output is always streamed, one resource at a time, so a
+    # generator never has to be held in memory as a whole
+    if output_json or output_ndjson:
+        if not isinstance(data, (list, types.GeneratorType)):
+            data = [data]
+
+        rows = (_project_row(d, show_links=show_links, expanded=expanded) for d in data)
+
+        if output_ndjson:
+            _output_ndjson(rows)
+        else:
+            _output_json_stream(rows)
+
+        return
+
+    # Piped and CSV output go through a single writer for the whole
+    # stream, so the columns and the header are only worked out once
+    if output_csv or not stdout.isatty():
+        if not isinstance(data, (list, types.GeneratorType)):
+            data = [data]
+
+        writer_class = CsvWriter if output_csv else TsvWriter
+        writer = writer_class(show_headers=show_headers, out=stdout)
+
+        # the rows written so far are kept if listing fails halfway
+        try:
+            for d in data:
+                writer.write(_project_row(d, show_links=show_links, expanded=expanded))
+        finally:
+            writer.flush()
+
+        return
 
-    # If we have generator and don't have to output JSON, we can
-    # loop throught it and output one resource at a time while
-    # keeping count of them, so we can output the total later
-    if isinstance(data, types.GeneratorType) and not output_json:
+    # If we have generator, we can loop throught it and output one
+    # resource at a time while keeping count of them, so we can
+    # output the total later
+    if isinstance(data, types.GeneratorType):
         resources_count = 0
         for d in data:
-            _output(d, show_links=show_links, show_headers=show_headers, output_json=output_json)
+            _output(d, show_links=show_links, show_headers=show_headers, output_json=output_json, expanded=expanded)
             resources_count += 1
 
     # For every other case, we are putting resources in a list (if
     # they are not already) and outputting them all at once
     else:
-        if isinstance(data, types.GeneratorType):
-            data = list(data)
-        elif not isinstance(data, list):
+        if not isinstance(data, list):
             data = [data]
 
-        _output(data, show_links=show_links, show_headers=show_headers, output_json=output_json)
+        _output(data, show_links=show_links, show_headers=show_headers, output_json=output_json, expanded=expanded)
         resources_count = len(data)
 
-    if stdout.isatty() and not output_json:
-        stdout.write('\nTotal number of Resources returned: {}\n'.format(resources_count))
+    stdout.write('\nTotal number of Resources returned: {}\n'.format(resources_count))
 
 
 def get_logger():
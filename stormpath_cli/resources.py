@@ -1,8 +1,33 @@
-from stormpath.client import Client
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from threading import Lock
+
+from . import index
+
+
+#: The number of Resources requested per collection page (the API maximum).
+PAGE_SIZE = 100
+
+_group_hrefs = {}
+_group_locks = {}
+_group_lock = Lock()
+
+
+def _to_camel_case(name):
+    """Converts a snake_case attribute name into the camelCase name used by
+    the REST API (ie. given_name -> givenName)."""
+    head, _, tail = name.partition('_')
+    if not tail:
+        return name
+
+    return head + ''.join(part.capitalize() for part in tail.split('_'))
 
 
 def get_resource(collection, id_name, id_value):
     """Makes sure a requested Resource actually exists."""
+    from stormpath.client import Client
+
     if id_value.startswith(Client.BASE_URL):
         return collection.get(id_value)
 
@@ -13,11 +38,104 @@ def get_resource(collection, id_name, id_value):
         raise ValueError('The requested resource does not exist.')
 
 
-def get_resource_data(resource):
-    """Get's the dict data for a requested Resource"""
+def index_ttl(args):
+    """Gets the number of seconds index entries are trusted for; 0 means the
+    index is disabled."""
+    try:
+        return int(args.get('--index-ttl') or 0)
+    except ValueError:
+        raise ValueError("Option '--index-ttl' expects a number of seconds.")
+
+
+def _index_scope(client, name):
+    """Index entries are kept per API key and collection."""
+    return '{} {}'.format(client.auth.id, name)
+
+
+def _has_identifier(data, id_name, id_value):
+    """Checks that Resource data still has the given name/email (which the
+    API matches case-insensitively). Links are compared by href."""
+    value = data.get(_to_camel_case(id_name))
+    if isinstance(value, dict):
+        value = value.get('href')
+
+    return value is not None and value.lower() == id_value.lower()
+
+
+def find_resource_data(collection, id_name, id_value, ttl=0):
+    """Gets a Resource like get_resource, along with its data (see
+    get_resource_data). When a ``ttl`` is given, names are resolved through
+    the local index first; the data is what an indexed Resource is checked
+    against, so one costs a single request instead of a search and a
+    fetch. An indexed Resource which was deleted or renamed since is
+    forgotten and searched for again."""
+    from stormpath.client import Client
+    from stormpath.error import Error
+
+    if not ttl or id_value.startswith(Client.BASE_URL):
+        resource = get_resource(collection, id_name, id_value)
+        return resource, get_resource_data(resource)
+
+    scope = _index_scope(collection._client, collection.href)
+    href = index.lookup(scope, id_name, id_value)
+    if href:
+        resource = collection.get(href)
+        try:
+            data = get_resource_data(resource)
+        except Error as ex:
+            if getattr(ex, 'status', None) != 404:
+                raise
+        else:
+            if _has_identifier(data, id_name, id_value):
+                return resource, data
+
+        index.forget(scope, id_name, id_value)
+
+    resource = get_resource(collection, id_name, id_value)
+    index.store(scope, id_name, id_value, resource.href, ttl)
+
+    return resource, get_resource_data(resource)
+
+
+def find_group_href(account, name):
+    """Resolves a Group name to its href in the directory of the account,
+    or returns None if there's no such Group. Names are only looked up once
+    per process, as bulk operations add many accounts to the same few
+    Groups. Concurrent lookups
+    only wait for each other when they're for the same name."""
+    from stormpath.client import Client
+
+    if name.startswith(Client.BASE_URL):
+        return name
+
+    groups = account.directory.groups
+    key = (groups.href, name)
+
+    if key in _group_hrefs:
+        return _group_hrefs[key]
+
+    with _group_lock:
+        lock = _group_locks.setdefault(key, Lock())
+
+    with lock:
+        if key not in _group_hrefs:
+            try:
+                _group_hrefs[key] = get_resource(groups, 'name', name).href
+            except ValueError:
+                _group_hrefs[key] = None
+
+        return _group_hrefs[key]
+
+
+def get_resource_data(resource, expand=None):
+    """Get's the dict data for a requested Resource, with the links named
+    in ``expand`` (the REST expand parameter) expanded inline."""
     # FIXME: uses undocumented and unsupported API; this should move into the
     # SDK proper before releasing
-    data = resource._store.get_resource(resource.href)
+    if expand:
+        data = resource._store.get_resource(resource.href, params={'expand': expand})
+    else:
+        data = resource._store.get_resource(resource.href)
     try:
         # if the internal meta field sp_http_status is present just remove it
         data.pop('sp_http_status')
@@ -27,46 +145,227 @@ def get_resource_data(resource):
     return data
 
 
+def changed_attributes(data, attrs):
+    """Returns the attributes (snake_case, as given on the command line)
+    whose values differ from the Resource ``data`` (camelCase, as returned
+    by the API)."""
+    changed = {}
+    for name, value in attrs.items():
+        current = data.get(_to_camel_case(name))
+        if current is None or str(current) != str(value):
+            changed[name] = value
+
+    return changed
+
+
+def save_resource_data(collection, href, attrs):
+    """Saves changed attributes of a Resource of the collection without
+    fetching the Resource first."""
+    # FIXME: uses undocumented and unsupported API, same as get_resource_data
+    data = dict((_to_camel_case(k), v) for k, v in attrs.items())
+    return collection._store.update_resource(href, data)
+
+
+def parse_fields(fields):
+    """Gets the attribute names (camelCase, as returned by the API) of a
+    --fields value like 'email,given_name,href'."""
+    return [_to_camel_case(f.strip()) for f in (fields or '').split(',') if f.strip()]
+
+
+def project_fields(data, fields):
+    """Keeps only ``fields`` of the Resource ``data``; missing ones are
+    None, so all rows have the same attributes."""
+    return dict((f, data.get(f)) for f in fields)
+
+
+def get_collection_page(collection, offset=0, limit=PAGE_SIZE, fields=None):
+    """Gets the dict data for a single page of a Resource collection. With
+    ``fields``, its Resources only keep those attributes."""
+    # FIXME: uses undocumented and unsupported API, same as get_resource_data
+    params = dict((_to_camel_case(k), v) for k, v in (getattr(collection, '_query', None) or {}).items())
+    params.update(offset=offset, limit=limit)
+
+    page = collection._store.get_resource(collection.href, params=params)
+    if fields:
+        # a new page, as the data store may have cached this one
+        page = dict(page, items=[project_fields(item, fields) for item in page.get('items', [])])
+
+    return page
+
+
+def _page_limit(offset, end):
+    """The page size to request at ``offset``, so that no Resources past
+    ``end`` (if any) are requested."""
+    return PAGE_SIZE if end is None else min(PAGE_SIZE, end - offset)
+
+
+def _page_end(page, end):
+    """Where paging stops: at the end of the collection, or ``end``."""
+    size = page.get('size', 0)
+    return size if end is None else min(size, end)
+
+
+def _iter_pages(collection, page, fields=None, end=None):
+    """Yields collection pages one after another, starting with ``page``."""
+    offset = page.get('offset') or 0
+    while True:
+        yield page
+
+        items = page.get('items', [])
+        offset += len(items)
+        if not items or offset >= _page_end(page, end):
+            break
+
+        page = get_collection_page(collection, offset, _page_limit(offset, end), fields)
+
+
+def _iter_pages_prefetched(collection, page, prefetch, fields=None, end=None):
+    """Yields collection pages in order while keeping up to ``prefetch``
+    upcoming pages in flight on a thread pool."""
+    yield page
+
+    limit = page.get('limit') or PAGE_SIZE
+    stop = _page_end(page, end)
+    offsets = iter(range((page.get('offset') or 0) + limit, stop, limit))
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+
+    try:
+        for offset in islice(offsets, prefetch):
+            pending.append(executor.submit(get_collection_page, collection, offset, min(limit, stop - offset), fields))
+
+        while pending:
+            page = pending.popleft().result()
+            for offset in islice(offsets, 1):
+                pending.append(executor.submit(get_collection_page, collection, offset, min(limit, stop - offset), fields))
+
+            yield page
+    finally:
+        for future in pending:
+            future.cancel()
+
+        executor.shutdown(wait=False)
+
+
+def iter_collection_pages(collection, offset=0, prefetch=0, fields=None, limit=None):
+    """Yields the pages of a collection, starting at ``offset``. With
+    ``prefetch`` set, that many upcoming pages are requested concurrently
+    while the current one is being consumed. With ``fields``, pages are
+    projected as soon as they're decoded (on the prefetching threads).
+    With ``limit``, no pages past that many Resources are requested."""
+    end = offset + limit if limit is not None else None
+    page = get_collection_page(collection, offset, _page_limit(offset, end), fields)
+
+    if prefetch > 0:
+        from .scheduler import schedule_client
+
+        schedule_client(collection._client, prefetch + 1)
+        return _iter_pages_prefetched(collection, page, prefetch, fields, end)
+
+    return _iter_pages(collection, page, fields, end)
+
+
+def iter_collection_data(collection, prefetch=0, fields=None, offset=0, limit=None):
+    """Yields the dict data for the Resources in a collection, only with
+    ``fields`` if given, skipping ``offset`` of them and stopping after
+    ``limit``.
+
+    Rows are taken straight from the collection page payload, so listing a
+    collection costs one request per page instead of one per Resource."""
+    if limit == 0:
+        return
+
+    count = 0
+    for page in iter_collection_pages(collection, offset, prefetch, fields, limit):
+        for item in page.get('items', []):
+            yield item
+
+            count += 1
+            if count == limit:
+                return
+
+
+def _get_context_resource(client, args, resource_class, name, value):
+    """Gets the Application/Directory used as context. When its href is
+    already known (ie. from the context file or the index), the Resource is
+    built from it directly and the tenant collection isn't touched at all.
+    Indexed names aren't checked again, so the index is only used when
+    asked for with --index-ttl."""
+    from stormpath.client import Client
+
+    if value.startswith(Client.BASE_URL):
+        return resource_class(client, href=value)
+
+    ttl = index_ttl(args)
+    if not ttl:
+        return get_resource(getattr(client, name), 'name', value)
+
+    scope = _index_scope(client, name)
+    href = index.lookup(scope, 'name', value)
+    if href:
+        return resource_class(client, href=href)
+
+    resource = get_resource(getattr(client, name), 'name', value)
+    index.store(scope, 'name', value, resource.href, ttl)
+
+    return resource
+
+
 def _get_context(client, args):
     """Gets the current context"""
+    from stormpath.resources.application import Application
+    from stormpath.resources.directory import Directory
+
     a = args.get('--in-application')
     d = args.get('--in-directory')
 
     if a and d:
         # setting a directory overrides setting an application
-        return get_resource(client.directories, 'name', d)
+        return _get_context_resource(client, args, Directory, 'directories', d)
     elif a:
-        return get_resource(client.applications, 'name', a)
+        return _get_context_resource(client, args, Application, 'applications', a)
     elif d:
-        return get_resource(client.directories, 'name', d)
+        return _get_context_resource(client, args, Directory, 'directories', d)
     else:
         raise ValueError("Set the context with --in-application, --in-directory or 'set'")
 
 
+def get_applications(client, args):
+    """Gets all applications in the tenant"""
+    return client.applications
+
+
+def get_directories(client, args):
+    """Gets all directories in the tenant"""
+    return client.directories
+
+
+def _get_context_collection(client, args, collection_class, name):
+    """Builds a collection of the current context from the context href
+    alone, so getting it doesn't require fetching the context Resource."""
+    context = _get_context(client, args)
+    return collection_class(client, href='{}/{}'.format(context.href, name))
+
+
 def get_accounts(client, args):
     """Gets all accounts from the current context"""
-    return _get_context(client, args).accounts
+    from stormpath.resources.account import AccountList
+
+    return _get_context_collection(client, args, AccountList, 'accounts')
 
 
 def get_groups(client, args):
     """Gets all groups from the current context"""
-    return _get_context(client, args).groups
+    from stormpath.resources.group import GroupList
+
+    return _get_context_collection(client, args, GroupList, 'groups')
 
 
 def get_mappings(client, args):
     """Gets all accounts store mappings for the set application"""
-    return _get_context(client, args).account_store_mappings
-
-
-AVAILABLE_RESOURCES = {
-    'application': lambda c, args: c.applications,
-    'applications': lambda c, args: c.applications,
-    'directory': lambda c, args: c.directories,
-    'directories': lambda c, args: c.directories,
-    'account': get_accounts,
-    'accounts': get_accounts,
-    'group': get_groups,
-    'groups': get_groups,
-    'mapping': get_mappings,
-    'mappings': get_mappings,
-}
+    from stormpath.resources.account_store_mapping import AccountStoreMappingList
+
+    if args.get('--in-directory'):
+        raise ValueError('Account store mappings are only available in an application context.')
+
+    return _get_context_collection(client, args, AccountStoreMappingList, 'accountStoreMappings')
@@ -0,0 +1,241 @@
+"""
+    stormpath_cli.scheduler
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    A shared scheduler for the API requests of the CLI. Every request made
+    through a scheduled client takes a slot in an adaptive concurrency
+    window: the window grows by one slot per window of successful responses
+    and is halved when the API throttles us (AIMD, as in TCP congestion
+    control). ``Retry-After`` pauses every request, and failed requests are
+    retried with jittered exponential backoff when that is safe.
+"""
+
+import random
+from email.utils import mktime_tz, parsedate_tz
+from threading import Condition, Lock
+from time import sleep, time
+
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from requests.exceptions import ConnectionError
+
+from .timing import span
+
+
+#: Responses telling us to slow down.
+THROTTLE_STATUSES = (429, 503)
+
+#: Responses worth retrying, if the request is idempotent.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+#: Methods which can safely be sent more than once.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+
+def parse_retry_after(value, now=None):
+    """Parses a ``Retry-After`` header (seconds or an HTTP date) into the
+    number of seconds to wait, or None."""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+
+    return max(0.0, mktime_tz(date) - (now or time()))
+
+
+class Scheduler(object):
+    """Limits the number of API requests in flight to an adaptive window of
+    at most ``max_concurrency`` requests, and decides on retries."""
+
+    def __init__(self, max_concurrency=1, max_retries=5, backoff=0.5, max_backoff=30):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.window = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0
+        self.decreased_at = 0
+        self.counters = dict(requests=0, throttled=0, retries=0, errors=0)
+        self.min_window = self.window
+
+        self._cond = Condition()
+
+    def grow(self, max_concurrency):
+        """Allows up to ``max_concurrency`` requests in flight (ie. when a
+        bulk operation starts more workers)."""
+        with self._cond:
+            if max_concurrency > self.max_concurrency:
+                self.max_concurrency = max_concurrency
+
+                # start wide open until the API pushes back
+                if not self.counters['throttled']:
+                    self.window = self.min_window = float(max_concurrency)
+
+                self._cond.notify_all()
+
+    def acquire(self):
+        """Waits for a free slot in the window and returns the time the
+        request started."""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self.in_flight >= max(1, int(self.window)):
+                    self._cond.wait()
+                else:
+                    break
+
+            self.in_flight += 1
+            self.counters['requests'] += 1
+            return time()
+
+    def release(self, started, status=None):
+        """Frees the slot of a request which started at ``started`` and
+        adapts the window to its response status (None for errors)."""
+        with self._cond:
+            self.in_flight -= 1
+
+            if status is None:
+                self.counters['errors'] += 1
+            elif status in THROTTLE_STATUSES:
+                self.counters['throttled'] += 1
+
+                # requests which were already in flight when the window was
+                # last halved mustn't halve it again
+                if started >= self.decreased_at:
+                    self.window = max(1.0, self.window / 2)
+                    self.decreased_at = time()
+                    self.min_window = min(self.min_window, self.window)
+            elif status < 500:
+                self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Holds back every request for ``seconds`` (ie. for Retry-After)."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time() + seconds)
+
+    def should_retry(self, method, status, attempt):
+        """Throttled requests weren't processed and can always be retried,
+        other failures (status None being a connection error) only for
+        idempotent methods."""
+        if attempt >= self.max_retries:
+            return False
+
+        if status == 429:
+            return True
+
+        return method in IDEMPOTENT_METHODS and (status is None or status in RETRY_STATUSES)
+
+    def retry_delay(self, attempt):
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def retried(self):
+        with self._cond:
+            self.counters['retries'] += 1
+
+    def summary(self):
+        return '{requests} requests, {throttled} throttled, {retries} retried, {errors} errors; ' \
+            'concurrency {window:.1f} of {max} (lowest {min:.1f}).'.format(
+                window=self.window, max=self.max_concurrency, min=self.min_window, **self.counters)
+
+
+class ScheduledAdapter(HTTPAdapter):
+    """A requests transport adapter sending every request through a
+    :class:`Scheduler`, retrying it when the scheduler says so."""
+
+    def __init__(self, scheduler, **kwargs):
+        self.scheduler = scheduler
+        super(ScheduledAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+
+        while True:
+            started = self.scheduler.acquire()
+            try:
+                with span('http'):
+                    response = super(ScheduledAdapter, self).send(request, **kwargs)
+            except ConnectionError:
+                self.scheduler.release(started)
+                if not self.scheduler.should_retry(request.method, None, attempt):
+                    raise
+
+                response = None
+            else:
+                self.scheduler.release(started, response.status_code)
+                if not self.scheduler.should_retry(request.method, response.status_code, attempt):
+                    return response
+
+            retry_after = response is not None and parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after:
+                self.scheduler.pause(retry_after)
+            else:
+                sleep(self.scheduler.retry_delay(attempt))
+
+            if response is not None:
+                response.close()
+
+            self.scheduler.retried()
+            attempt += 1
+
+
+def get_scheduler():
+    """Returns the scheduler shared by every client in this process."""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+
+        return _scheduler
+
+
+def schedule_session(session, concurrency=1):
+    """Sends the requests of a requests session through the shared
+    scheduler, allowing up to ``concurrency`` of them in flight and keeping
+    enough connections open for them."""
+    scheduler = get_scheduler()
+    scheduler.grow(concurrency)
+    pool_size = max(DEFAULT_POOLSIZE, concurrency)
+
+    for prefix in ('https://', 'http://'):
+        adapter = session.get_adapter(prefix)
+        if isinstance(adapter, ScheduledAdapter) and adapter._pool_maxsize >= pool_size:
+            continue
+
+        session.mount(prefix, ScheduledAdapter(scheduler, pool_maxsize=pool_size, max_retries=adapter.max_retries))
+
+    return scheduler
+
+
+def schedule_client(client, concurrency=1):
+    """Sends the requests of an API client through the shared scheduler,
+    see :func:`schedule_session`. The scheduler takes over retrying from
+    the client."""
+    # FIXME: uses undocumented SDK internals to get to the session
+    try:
+        executor = client.data_store.executor
+        session = executor.session
+    except AttributeError:
+        return get_scheduler()
+
+    # the SDK's executor retries throttled requests and server errors for
+    # every method, on top of the scheduler's retries
+    executor.MAX_RETRIES = 0
+
+    return schedule_session(session, concurrency)
@@ -0,0 +1,130 @@
+"""
+    stormpath_cli.shell
+    ~~~~~~~~~~~~~~~~~~~
+
+    An interactive shell running CLI commands in a single process, so that
+    the API client, its HTTP connections and the resolved context are set
+    up once instead of once per command.
+"""
+
+from __future__ import print_function
+
+import shlex
+
+from six import string_types
+from six.moves import input
+
+from .output import get_logger
+from .util import get_config_path
+
+
+#: Options given when starting the shell which apply to every command in it.
+SESSION_OPTIONS = ('--apikey', '--apikeyfile')
+
+#: The name of the shell history file in the cli config directory.
+HISTORY_FILE = 'shell_history'
+
+PROMPT = 'stormpath> '
+
+
+def _setup_history():
+    try:
+        import atexit
+        import readline
+    except ImportError:
+        return
+
+    path = get_config_path(HISTORY_FILE)
+    try:
+        readline.read_history_file(path)
+    except (IOError, OSError):
+        pass
+
+    atexit.register(readline.write_history_file, path)
+
+
+def _read_line():
+    return input(PROMPT)
+
+
+def parse_command_argv(argv, session_args):
+    """Parses the arguments of a single command using the regular CLI
+    grammar. Returns None for empty commands."""
+    from .arguments import parse_arguments
+    from .main import __doc__ as doc
+
+    if argv and argv[0] == 'stormpath':
+        argv = argv[1:]
+
+    if not argv:
+        return None
+
+    arguments = parse_arguments(doc, argv)
+    for opt in SESSION_OPTIONS:
+        if not arguments.get(opt) and session_args.get(opt):
+            arguments[opt] = session_args[opt]
+
+    return arguments
+
+
+def parse_command(line, session_args):
+    """Parses a single command line using the regular CLI grammar.
+    Returns None for blank lines and comments."""
+    return parse_command_argv(shlex.split(line, comments=True), session_args)
+
+
+def run_shell(args):
+    """Shell action: Reads commands from the terminal and runs them with a
+    shared API client until 'exit' or EOF."""
+    from .main import run_command, shared_client_factory
+
+    log = get_logger()
+    get_client = shared_client_factory()
+
+    _setup_history()
+    log.info("Stormpath shell. Type 'help' for the list of commands, 'exit' to leave.")
+
+    while True:
+        try:
+            line = _read_line()
+        except EOFError:
+            print()
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+
+        if line.strip() in ('exit', 'quit'):
+            break
+
+        try:
+            arguments = parse_command(line, args)
+        except ValueError as ex:
+            log.error(str(ex))
+            continue
+        except SystemExit as ex:
+            # docopt exits on --help and on invalid command lines
+            if ex.code:
+                log.error(ex.code)
+            continue
+
+        if arguments is None:
+            continue
+
+        if arguments.get('<action>') == 'shell':
+            log.error('Already running the shell.')
+            continue
+
+        try:
+            run_command(arguments, get_client=get_client)
+        except SystemExit as ex:
+            # some actions exit, ie. when a prompt is cancelled
+            if isinstance(ex.code, string_types):
+                log.error(ex.code)
+        except Exception as ex:
+            # run_command only handles the expected errors; a bug in one
+            # command mustn't end the whole session
+            log.debug('Unexpected error', exc_info=True)
+            log.error(str(ex))
+
+    return True
@@ -0,0 +1,205 @@
+"""
+    stormpath_cli.sync
+    ~~~~~~~~~~~~~~~~~~
+
+    Keeps a local snapshot of a tenant (applications, directories, groups
+    and accounts) in an SQLite database, updated incrementally.
+
+    Every collection has a high-water mark, the latest modifiedAt seen in
+    it. A sync only requests the Resources modified since the mark: with a
+    date range search (modifiedAt=[mark,]) where the API supports it, and
+    otherwise by walking the collection ordered by modifiedAt, newest
+    first, until the mark is reached. Deletions can't be searched for, so
+    only when the size of a collection no longer matches the snapshot
+    (including the Resources created since the last sync) are its
+    Resources listed in full to find the deleted ones. A Resource created
+    and another one deleted while the sync runs can hide a deletion until
+    the next sync.
+
+    Every change is written to a change feed (JSONL) as a created, updated
+    or deleted row. The snapshot is committed once, after the changes of
+    every collection have been written to the feed, so an interrupted sync
+    is repeated in full rather than losing changes.
+"""
+
+import json
+import os
+import sqlite3
+
+from stormpath.error import Error
+
+from .export import TENANT_COLLECTIONS
+from .output import get_logger
+from .resources import get_collection_page, iter_collection_data, iter_collection_pages
+
+
+#: Where the snapshot is kept, unless given.
+DEFAULT_SNAPSHOT = 'stormpath-snapshot.db'
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS resources (href TEXT PRIMARY KEY, collection TEXT NOT NULL, '
+    'modified_at TEXT, data TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS resources_collection ON resources (collection)',
+    'CREATE TABLE IF NOT EXISTS marks (collection TEXT PRIMARY KEY, modified_at TEXT NOT NULL)',
+)
+
+
+class Snapshot(object):
+    """The Resources of a tenant as of the last sync, and the high-water
+    mark of every collection."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        for statement in _SCHEMA:
+            self.db.execute(statement)
+
+    def close(self):
+        self.db.close()
+
+    def commit(self):
+        self.db.commit()
+
+    def mark(self, collection):
+        row = self.db.execute('SELECT modified_at FROM marks WHERE collection = ?', (collection,)).fetchone()
+        return row[0] if row else None
+
+    def set_mark(self, collection, modified_at):
+        self.db.execute('INSERT OR REPLACE INTO marks (collection, modified_at) VALUES (?, ?)',
+            (collection, modified_at))
+
+    def save(self, collection, item):
+        """Saves a Resource and returns how it changed (created or updated),
+        or None if it is unchanged."""
+        row = self.db.execute('SELECT modified_at FROM resources WHERE href = ?', (item['href'],)).fetchone()
+        if row and row[0] == item.get('modifiedAt'):
+            return None
+
+        self.db.execute('INSERT OR REPLACE INTO resources (href, collection, modified_at, data) VALUES (?, ?, ?, ?)',
+            (item['href'], collection, item.get('modifiedAt'), json.dumps(item, sort_keys=True)))
+
+        return UPDATED if row else CREATED
+
+    def delete(self, href):
+        self.db.execute('DELETE FROM resources WHERE href = ?', (href,))
+
+    def count(self, collection):
+        return self.db.execute('SELECT COUNT(*) FROM resources WHERE collection = ?', (collection,)).fetchone()[0]
+
+    def hrefs(self, collection):
+        return [row[0] for row in self.db.execute('SELECT href FROM resources WHERE collection = ?', (collection,))]
+
+
+def _modified_since_ordered(collection, mark):
+    """Walks a collection, most recently modified first, until ``mark``.
+    Pages are requested one at a time, so none are requested past it."""
+    for item in iter_collection_data(collection.query(order_by='modifiedAt desc')):
+        if (item.get('modifiedAt') or '') < mark:
+            return
+
+        yield item
+
+
+def _modified_since(collection, mark, prefetch):
+    """Yields the Resources of a collection modified at or after ``mark``
+    (inclusive, as timestamps only have millisecond precision)."""
+    try:
+        pages = iter_collection_pages(collection.query(modified_at='[{},]'.format(mark)), prefetch=prefetch)
+    except Error as ex:
+        if getattr(ex, 'status', None) != 400:
+            raise
+
+        get_logger().debug('Searching by date is not supported, walking {} by modifiedAt.'.format(collection.href))
+        return _modified_since_ordered(collection, mark)
+
+    return (item for page in pages for item in page.get('items', []))
+
+
+def _deleted(snapshot, name, collection, prefetch):
+    """Gets the hrefs of the Resources deleted since the last sync."""
+    # the Resources created since have already been saved, so the sizes
+    # only match when nothing was deleted
+    size = get_collection_page(collection, 0, 1).get('size', 0)
+    if size == snapshot.count(name):
+        return []
+
+    live = set(item['href'] for item in iter_collection_data(collection, prefetch))
+    return [href for href in snapshot.hrefs(name) if href not in live]
+
+
+def _emit(feed, change, name, href, item=None):
+    row = {'change': change, 'collection': name, 'href': href}
+    if item is not None:
+        row['resource'] = item
+
+    feed.write(json.dumps(row, sort_keys=True))
+    feed.write('\n')
+
+
+def _sync_collection(snapshot, name, collection, feed, prefetch):
+    """Merges the changes of a collection into the snapshot and the change
+    feed, and returns the number of changes of every kind."""
+    counts = {CREATED: 0, UPDATED: 0, DELETED: 0}
+    mark = latest = snapshot.mark(name)
+
+    if mark is None:
+        items = iter_collection_data(collection, prefetch)
+    else:
+        items = _modified_since(collection, mark, prefetch)
+
+    for item in items:
+        change = snapshot.save(name, item)
+        if change:
+            _emit(feed, change, name, item['href'], item)
+            counts[change] += 1
+
+        # the mark comes from the API's clock, not ours
+        modified = item.get('modifiedAt')
+        if modified and (latest is None or modified > latest):
+            latest = modified
+
+    if mark is not None:
+        for href in _deleted(snapshot, name, collection, prefetch):
+            snapshot.delete(href)
+            _emit(feed, DELETED, name, href)
+            counts[DELETED] += 1
+
+    if latest is not None:
+        snapshot.set_mark(name, latest)
+
+    return counts
+
+
+def sync_tenant(client, args):
+    """Sync action: Updates the snapshot given as resource with the changes
+    since the last sync, writing them to the --results change feed."""
+    from .actions import _int_option
+
+    log = get_logger()
+    path = args.get('<resource>') or DEFAULT_SNAPSHOT
+    feed_path = args.get('--results') or path + '.changes.jsonl'
+    prefetch = _int_option(args, '--prefetch')
+
+    totals = {CREATED: 0, UPDATED: 0, DELETED: 0}
+    snapshot = Snapshot(path)
+    try:
+        with open(feed_path, 'w') as feed:
+            for name in TENANT_COLLECTIONS:
+                counts = _sync_collection(snapshot, name, getattr(client, name), feed, prefetch)
+
+                log.info('{}: {} created, {} updated, {} deleted.'.format(
+                    name, counts[CREATED], counts[UPDATED], counts[DELETED]))
+                for change, count in counts.items():
+                    totals[change] += count
+
+            feed.flush()
+            os.fsync(feed.fileno())
+
+        snapshot.commit()
+    finally:
+        snapshot.close()
+
+    return dict(totals, snapshot=path, changes=feed_path)
@@ -0,0 +1,100 @@
+"""
+    stormpath_cli.timing
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Per-phase timings for --profile. Phases (ie. imports, http or output)
+    are recorded as spans; the time of a span excludes the spans nested in
+    it on the same thread, so the phases of a command add up to its wall
+    time, apart from work done concurrently on other threads.
+
+    This module is imported first by main, so that its import time marks
+    the start of the CLI's own imports.
+"""
+
+from __future__ import print_function
+
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock, local
+from time import time
+
+
+#: When the CLI started importing its modules.
+STARTED = time()
+
+_enabled = False
+_lock = Lock()
+_totals = OrderedDict()
+_counts = {}
+_stack = local()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+def add(name, seconds, count=1):
+    """Adds ``seconds`` to the time spent in phase ``name``."""
+    with _lock:
+        _totals[name] = _totals.get(name, 0) + seconds
+        _counts[name] = _counts.get(name, 0) + count
+
+
+@contextmanager
+def span(name):
+    """Records the time spent in the with block as phase ``name``."""
+    if not _enabled:
+        yield
+        return
+
+    stack = getattr(_stack, 'spans', None)
+    if stack is None:
+        stack = _stack.spans = []
+
+    # the time of nested spans is subtracted from this one
+    stack.append(0)
+    start = time()
+    try:
+        yield
+    finally:
+        elapsed = time() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+
+        add(name, elapsed - nested)
+
+
+def instrument_json():
+    """Times the decoding of API responses, which the SDK leaves to
+    requests."""
+    from requests.models import Response
+
+    decode = Response.json
+    if getattr(decode, 'timed', False):
+        return
+
+    def json(self, **kwargs):
+        with span('json'):
+            return decode(self, **kwargs)
+
+    json.timed = True
+    Response.json = json
+
+
+def report(out=None):
+    """Prints the time spent in every phase, in the order they started."""
+    out = out or sys.stderr
+    wall = time() - STARTED
+
+    print('Profile: {:.1f} ms since the CLI started importing'.format(wall * 1000), file=out)
+    for name, seconds in _totals.items():
+        count = _counts[name]
+        calls = ' ({} calls)'.format(count) if count > 1 else ''
+        print('  {:<12}{:>10.1f} ms{:>7.1f}%{}'.format(name, seconds * 1000, seconds / wall * 100, calls), file=out)
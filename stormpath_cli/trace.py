@@ -0,0 +1,125 @@
+"""
+    stormpath_cli.trace
+    ~~~~~~~~~~~~~~~~~~~
+
+    HTTP request tracing for --trace. Every response of a traced client is
+    recorded with its method, endpoint (the path with the resource ids
+    replaced, ie. /directories/{id}/accounts), status, size and latency, and
+    summarized per endpoint at exit. With --trace-file, every request is
+    also written to a JSONL file as it completes.
+"""
+
+from __future__ import print_function
+
+import sys
+from collections import OrderedDict
+from json import dumps
+from math import ceil
+from threading import Lock
+
+from six.moves.urllib.parse import urlparse
+
+
+_enabled = False
+_lock = Lock()
+_dump = None
+_endpoints = OrderedDict()
+
+
+def enable(dump_path=None):
+    """Starts tracing the clients passed to :func:`trace_client`."""
+    global _enabled, _dump
+
+    _enabled = True
+    if dump_path:
+        _dump = open(dump_path, 'w')
+
+
+def enabled():
+    return _enabled
+
+
+def endpoint(url):
+    """Gets the endpoint of a request URL. API paths alternate between
+    collection names and resource ids (ie. /v1/accounts/<id>/groups), and the
+    ids are replaced with {id}."""
+    parts = urlparse(url).path.strip('/').split('/')
+    if parts and parts[0] == 'v1':
+        parts = parts[1:]
+
+    return '/' + '/'.join('{id}' if i % 2 else p for i, p in enumerate(parts))
+
+
+def record(response, *args, **kwargs):
+    """A requests response hook recording the request."""
+    request = response.request
+    entry = OrderedDict([
+        ('method', request.method),
+        ('endpoint', endpoint(request.url)),
+        ('status', response.status_code),
+        ('bytes', len(response.content or b'')),
+        ('latency', response.elapsed.total_seconds()),
+        ('url', request.url),
+    ])
+
+    with _lock:
+        stats = _endpoints.setdefault((entry['method'], entry['endpoint']), dict(latencies=[], bytes=0, errors=0))
+        stats['latencies'].append(entry['latency'])
+        stats['bytes'] += entry['bytes']
+        if entry['status'] >= 400:
+            stats['errors'] += 1
+
+        if _dump:
+            _dump.write(dumps(entry))
+            _dump.write('\n')
+
+
+def trace_client(client):
+    """Records every response the API client receives."""
+    # FIXME: uses undocumented SDK internals to get to the session
+    try:
+        session = client.data_store.executor.session
+    except AttributeError:
+        return
+
+    if record not in session.hooks['response']:
+        session.hooks['response'].append(record)
+
+
+def percentile(values, p):
+    """The nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0
+
+    rank = int(ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def report(out=None):
+    """Prints the request count, bytes and latency percentiles per endpoint
+    and closes the JSONL file."""
+    global _dump
+
+    out = out or sys.stderr
+
+    with _lock:
+        if _dump:
+            _dump.close()
+            _dump = None
+
+        requests = sum(len(s['latencies']) for s in _endpoints.values())
+        total = sum(s['bytes'] for s in _endpoints.values())
+
+        print('Trace: {} requests, {} bytes received'.format(requests, total), file=out)
+        if not requests:
+            return
+
+        print('  {:<7}{:<40}{:>8}{:>8}{:>12}{:>10}{:>10}{:>10}'.format(
+            'method', 'endpoint', 'count', 'errors', 'bytes', 'p50 ms', 'p95 ms', 'p99 ms'), file=out)
+
+        for (method, name), stats in _endpoints.items():
+            latencies = sorted(stats['latencies'])
+            print('  {:<7}{:<40}{:>8}{:>8}{:>12}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                method, name, len(latencies), stats['errors'], stats['bytes'],
+                percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+                percentile(latencies, 99) * 1000), file=out)
@@ -1,5 +1,5 @@
 import sys
-from os import X_OK, access, chmod, environ, makedirs, rename, unlink, pathsep
+from os import X_OK, access, chmod, environ, getpid, makedirs, rename, unlink, pathsep
 from os.path import dirname, isfile, exists, join, splitdrive, split
 
 
@@ -18,15 +18,16 @@ def get_config_path(name):
     return join(sp_root_dir, name)
 
 
-def store_config_file(name, data):
+def store_config_file(name, data, binary=False):
     """Stores cli config file."""
     fpath = get_config_path(name)
 
     if not exists(dirname(fpath)):
         makedirs(dirname(fpath), 0o700)
 
-    tmp = fpath + '.tmp'
-    with open(tmp, 'w') as fd:
+    # concurrent cli processes mustn't share the temporary file
+    tmp = '{}.{}.tmp'.format(fpath, getpid())
+    with open(tmp, 'wb' if binary else 'w') as fd:
         fd.write(data)
         chmod(tmp, 0o400)
 
@@ -41,12 +42,12 @@ def delete_config_file(name):
     return True
 
 
-def get_config_file(name, default=None):
+def get_config_file(name, default=None, binary=False):
     """Helper function for getting the config file data."""
     fpath = get_config_path(name)
 
     if exists(fpath):
-        return open(fpath, 'r').read()
+        return open(fpath, 'rb' if binary else 'r').read()
     else:
         return default
 
@@ -65,8 +66,7 @@ def strip_equal_sign(arguments):
 def find_non_dash_arguments_and_default_action(arguments, resource, action):
     """Sets the default action to list if no action is supplied.
     Finds all param=value pairs (ie. without dashes)"""
-    from .actions import DEFAULT_ACTION
-    from .resources import AVAILABLE_RESOURCES
+    from .commands import AVAILABLE_RESOURCES, DEFAULT_ACTION
 
     arguments = strip_equal_sign(arguments)
     if resource and resource.find('=') != -1:
@@ -87,10 +87,15 @@ def check_primary_identifier_without_flags(arguments, resource, action):
     """See if the primary attribute (ie. name/email) is supplied without
     the -n/--name flags (ie. stormpath create application 'MyApplication')
     and collect them in the <attributes> dict formated as name=value pairs."""
-    from stormpath.client import Client
+    from .commands import IMPORT_ACTION
+
+    if action == IMPORT_ACTION:
+        return arguments
 
     for i, attr in enumerate(arguments.get('<attributes>')):
         if attr.find('=') == -1:
+            from stormpath.client import Client
+
             if attr.startswith(Client.BASE_URL):
                 arguments['<attributes>'][i] = 'href=' + attr
             else:
@@ -0,0 +1,127 @@
+"""
+    bench_api
+    ~~~~~~~~~
+
+    End-to-end benchmarks of the CLI commands against the local API
+    stand-in (stub_api.py), seeded with a directory of synthetic accounts.
+    Every benchmark runs the command in a forked process and reports the
+    number of API requests it made, its wall time and its peak RSS.
+
+    Usage: python tests/bench_api.py [<accounts>] [<latency ms>]
+"""
+
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+from time import time
+
+from stub_api import StubAPI
+
+
+#: The directory every benchmark works in, by name.
+DIRECTORY = 'directories-0'
+
+
+def _seed_accounts(api, count, **attrs):
+    api.seed('/directories', 1)
+    api.seed('/directories/0/accounts', count, email='user{i}@example.com',
+        givenName='Given{i}', surname='Surname{i}', status='ENABLED', **attrs)
+
+
+def _write_import_file(tmp, count):
+    path = os.path.join(tmp, 'accounts.csv')
+    with open(path, 'w') as fd:
+        fd.write('email,given_name,surname,password\n')
+        for i in range(count):
+            fd.write('new{0}@example.com,New{0},Surname{0},Secret{0}!\n'.format(i))
+
+    return path
+
+
+def list_accounts(api, tmp, count):
+    _seed_accounts(api, count)
+    return ['list', 'accounts', '-D', DIRECTORY, '--output-ndjson']
+
+
+def create_accounts(api, tmp, count):
+    _seed_accounts(api, 0)
+    return ['import', 'accounts', _write_import_file(tmp, count), '-D', DIRECTORY, '--results', os.devnull]
+
+
+def update_accounts(api, tmp, count):
+    _seed_accounts(api, count)
+    return ['update', 'accounts', 'status=DISABLED', '--all-matching', '--status', 'ENABLED', '-D', DIRECTORY, '--force']
+
+
+def delete_accounts(api, tmp, count):
+    _seed_accounts(api, count)
+    return ['delete', 'accounts', '--all-matching', '--status', 'ENABLED', '-D', DIRECTORY, '--force']
+
+
+def export_tenant(api, tmp, count):
+    _seed_accounts(api, count)
+    api.seed('/accounts', count, email='user{i}@example.com', givenName='Given{i}', surname='Surname{i}')
+    return ['export', os.path.join(tmp, 'export')]
+
+
+BENCHMARKS = [
+    ('list', list_accounts),
+    ('create', create_accounts),
+    ('update', update_accounts),
+    ('delete', delete_accounts),
+    ('export', export_tenant),
+]
+
+
+def _run(argv, base_url, home, results):
+    """Runs a CLI command in the forked benchmark process."""
+    from stormpath.client import Client
+
+    from stormpath_cli.arguments import parse_arguments
+    from stormpath_cli.main import __doc__ as doc, run_command
+    from stormpath_cli.output import setup_output
+    from stormpath_cli.scheduler import schedule_client
+
+    os.environ['HOME'] = home
+    sys.stdout = open(os.devnull, 'w')
+    setup_output(False)
+
+    def get_client(arguments):
+        client = Client(id='id', secret='secret', base_url=base_url)
+        schedule_client(client)
+        return client
+
+    start = time()
+    ret = run_command(parse_arguments(doc, argv), get_client=get_client)
+    elapsed = time() - start
+
+    results.put((ret, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def main(count=10000, latency=0):
+    print('{:<10}{:>10}{:>12}{:>12}{:>14}'.format('command', 'accounts', 'requests', 'wall (s)', 'peak RSS (MB)'))
+
+    for name, setup in BENCHMARKS:
+        tmp = tempfile.mkdtemp()
+        api = StubAPI(latency=latency / 1000.0).start()
+
+        try:
+            argv = setup(api, tmp, count)
+            results = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=_run, args=(argv, api.base_url, tmp, results))
+            proc.start()
+            ret, elapsed, rss = results.get()
+            proc.join()
+        finally:
+            api.stop()
+            shutil.rmtree(tmp)
+
+        status = '' if ret == 0 else '  (failed)'
+        print('{:<10}{:>10}{:>12}{:>12.2f}{:>14.1f}{}'.format(name, count, len(api.requests), elapsed, rss / 1024.0, status))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
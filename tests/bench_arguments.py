@@ -0,0 +1,47 @@
+"""
+    bench_arguments
+    ~~~~~~~~~~~~~~~
+
+    Compares parsing a typical command line with plain docopt (which parses
+    the usage string on every run) against the cached argument grammar, as
+    seen by a fresh process (grammar loaded from the cache file) and by a
+    long running one (grammar already in memory).
+
+    Usage: python tests/bench_arguments.py [<iterations>]
+"""
+
+import sys
+from timeit import timeit
+
+from docopt import docopt
+
+from stormpath_cli import arguments
+from stormpath_cli.main import __doc__ as doc
+
+
+ARGV = ['list', 'accounts', '-A', 'foo']
+
+
+def cold():
+    docopt(doc, ARGV)
+
+
+def cached_file():
+    arguments._grammars.clear()
+    arguments.parse_arguments(doc, ARGV)
+
+
+def cached_memory():
+    arguments.parse_arguments(doc, ARGV)
+
+
+def main(iterations=1000):
+    arguments.parse_arguments(doc, ARGV)  # make sure the cache file exists
+
+    for name, fn in [('docopt', cold), ('cached (file)', cached_file), ('cached (memory)', cached_memory)]:
+        elapsed = timeit(fn, number=iterations)
+        print('{:<16}{:>10.1f} us/parse'.format(name, elapsed / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
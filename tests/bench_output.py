@@ -0,0 +1,81 @@
+"""
+    bench_output
+    ~~~~~~~~~~~~
+
+    Micro-benchmark for the output layer. Prints the rows/sec of the human
+    readable, TSV and JSON output modes (including link removal) for a batch
+    of synthetic account rows.
+
+    Usage: python tests/bench_output.py [<rows>]
+"""
+
+import os
+import sys
+from time import time
+
+from stormpath_cli import output
+
+
+def synthetic_rows(count):
+    base = 'https://api.stormpath.com/v1/accounts/'
+    for i in range(count):
+        href = base + str(i)
+        yield {
+            'href': href,
+            'username': 'user%s' % i,
+            'email': 'user%s@example.com' % i,
+            'givenName': 'Given%s' % i,
+            'middleName': None,
+            'surname': 'Surname%s' % i,
+            'fullName': 'Given%s Surname%s' % (i, i),
+            'status': 'ENABLED',
+            'createdAt': '2017-01-01T00:00:00.000Z',
+            'modifiedAt': '2017-01-01T00:00:00.000Z',
+            'customData': {'href': href + '/customData'},
+            'directory': {'href': 'https://api.stormpath.com/v1/directories/1'},
+            'groups': {'href': href + '/groups'},
+            'groupMemberships': {'href': href + '/groupMemberships'},
+            'tenant': {'href': 'https://api.stormpath.com/v1/tenants/1'},
+        }
+
+
+def human_readable(rows, out):
+    output._output_to_tty_human_readable((output._project_row(r) for r in rows), out=out)
+
+
+def tsv(rows, out):
+    writer = output.TsvWriter(show_headers=True, out=out)
+    for r in rows:
+        writer.write(output._project_row(r))
+
+    writer.flush()
+
+
+def json_array(rows, out):
+    output._output_json_stream((output._project_row(r) for r in rows), out=out)
+
+
+def ndjson(rows, out):
+    output._output_ndjson((output._project_row(r) for r in rows), out=out)
+
+
+BENCHMARKS = [
+    ('human readable', human_readable),
+    ('tsv', tsv),
+    ('json', json_array),
+    ('ndjson', ndjson),
+]
+
+
+def main(count=100000):
+    rows = list(synthetic_rows(count))
+    with open(os.devnull, 'w') as out:
+        for name, fn in BENCHMARKS:
+            start = time()
+            fn(rows, out)
+            elapsed = time() - start
+            print('{:<16}{:>12.0f} rows/sec'.format(name, count / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,498 @@
+"""
+    stub_api
+    ~~~~~~~~
+
+    An in-process stand-in for the subset of the Stormpath REST API used by
+    the CLI: the tenant, applications, directories, groups, accounts, group
+    memberships and account store mappings, with offset/limit paging,
+    searching (including date ranges, ie. modifiedAt=[2017-01-01,]),
+    ordering, link expansion, creating, updating and deleting.
+
+    Collections can be seeded with millions of synthetic resources, which
+    are only generated when they are requested, and every request can be
+    delayed by a fixed latency. Tests use it to count the HTTP requests the
+    CLI makes; the benchmarks (bench_api.py) to measure it end to end.
+
+    StubClient stands in for the parts of an SDK client that the CLI uses
+    without building Resources (the data store and collection hrefs), so
+    tests can exercise them against the stand-in without the SDK's HTTP
+    layer.
+"""
+
+import json
+import re
+import threading
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from fnmatch import fnmatchcase
+from time import sleep
+
+from requests import Session
+from six import string_types
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, urlparse
+
+
+#: Collection names, the last segment of collection paths.
+COLLECTIONS = ('applications', 'directories', 'accounts', 'groups', 'accountStoreMappings', 'groupMemberships',
+    'accountMemberships')
+
+#: Query parameters which aren't search filters.
+CONTROL_PARAMS = ('offset', 'limit', 'expand', 'orderBy')
+
+#: Links every new resource of a type gets, relative to its own href.
+LINKS = {
+    'applications': ('accounts', 'groups', 'accountStoreMappings', 'customData'),
+    'directories': ('accounts', 'groups', 'customData'),
+    'groups': ('accounts', 'accountMemberships', 'customData'),
+    'accounts': ('groups', 'groupMemberships', 'customData'),
+}
+
+#: The creation time of synthetic resource 0, the next ones are a second apart.
+EPOCH = datetime(2017, 1, 1)
+
+TENANT = '/tenants/stub'
+
+
+def _timestamp(when):
+    return when.strftime('%Y-%m-%dT%H:%M:%S.') + '{:03d}Z'.format(when.microsecond // 1000)
+
+
+def _error(status, message):
+    return status, {'status': status, 'code': status, 'message': message, 'developerMessage': message}
+
+
+def _is_range(value):
+    return value[:1] in '[(' and value[-1:] in '])' and ',' in value
+
+
+def _in_range(actual, value):
+    """Whether ``actual`` is in a range like [start,end), either end of
+    which can be left out. Timestamps compare as strings."""
+    start, _, end = value[1:-1].partition(',')
+    if start and (actual < start or (value[0] == '(' and actual == start)):
+        return False
+
+    return not end or actual < end or (value[-1] == ']' and actual == end)
+
+
+def _matches(item, filters):
+    """Stormpath search semantics: 'q' matches a substring of any string
+    attribute, date ranges (ie. [2017-01-01,]) the attribute's timestamp,
+    other filters an attribute exactly (case insensitive, with '*'
+    wildcards)."""
+    for name, value in filters:
+        if _is_range(value):
+            actual = item.get(name)
+            if not isinstance(actual, string_types) or not _in_range(actual, value):
+                return False
+            continue
+
+        value = value.lower()
+        if name == 'q':
+            if not any(value in v.lower() for v in item.values() if isinstance(v, string_types)):
+                return False
+        else:
+            actual = item.get(name)
+            if not isinstance(actual, string_types) or not fnmatchcase(actual.lower(), value):
+                return False
+
+    return True
+
+
+class Collection(object):
+    """A collection of ``synthetic`` generated resources, followed by the
+    hrefs of resources created in (or added to) it."""
+
+    def __init__(self, api, path):
+        self.api = api
+        self.path = path
+        self.synthetic = 0
+        self.attrs = {}
+        self.deleted = []
+        self.hrefs = []
+        self._searches = {}
+
+    def __len__(self):
+        return self.synthetic - len(self.deleted) + len(self.hrefs)
+
+    def __getitem__(self, position):
+        if position < 0 or position >= len(self):
+            raise IndexError(position)
+
+        live = self.synthetic - len(self.deleted)
+        if position >= live:
+            return self.api.find(self.hrefs[position - live])
+
+        # skip over the deleted synthetic resources in front of it
+        i = position
+        while True:
+            j = position + bisect_right(self.deleted, i)
+            if j == i:
+                return self.item(i)
+            i = j
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def item(self, i):
+        """Gets synthetic resource ``i``, as last updated."""
+        href = self.api.href('{}/{}'.format(self.path, i))
+        if href in self.api.resources:
+            return self.api.resources[href]
+
+        created = _timestamp(EPOCH + timedelta(seconds=i))
+        item = dict(href=href, name='{}-{}'.format(self.path.strip('/'), i), createdAt=created, modifiedAt=created)
+        for name, value in self.attrs.items():
+            item[name] = value.format(i=i) if isinstance(value, string_types) and '{i}' in value else value
+
+        self.api.add_links(item, self.path)
+        return item
+
+    def remove(self, href):
+        if href in self.hrefs:
+            self.hrefs.remove(href)
+            return
+
+        path, _, i = self.api.path(href).rpartition('/')
+        if path == self.path and i.isdigit() and int(i) < self.synthetic:
+            insort(self.deleted, int(i))
+
+    def search(self, filters, order_by=None):
+        """Gets the matching resources, optionally ordered (ie. by
+        'modifiedAt desc'), cached until the API changes."""
+        key = (tuple(sorted(filters)), order_by)
+        version, items = self._searches.get(key, (None, None))
+        if version != self.api.version:
+            items = [item for item in self if _matches(item, key[0])]
+            if order_by:
+                name, _, direction = order_by.partition(' ')
+                items.sort(key=lambda item: item.get(name) or '', reverse=direction.lower() == 'desc')
+            self._searches[key] = (self.api.version, items)
+
+        return items
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        api = self.server.api
+        url = urlparse(self.path)
+        path = url.path[len('/v1'):] if url.path.startswith('/v1/') else url.path
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        api.requests.append((method, path, query))
+
+        if api.latency:
+            sleep(api.latency)
+
+        fault = api.next_fault()
+        if fault:
+            status, retry_after = fault
+            headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+            return self._send(status, {'status': status, 'message': 'Throttled.'}, headers)
+
+        if path == '/tenants/current':
+            return self._send(302, None, {'Location': api.href(TENANT)})
+
+        try:
+            data = json.loads(body.decode('utf-8')) if body else {}
+        except ValueError:
+            return self._send(*_error(400, 'Invalid JSON.'))
+
+        with api.lock:
+            if method == 'GET':
+                status, result = api.get(path, query)
+            elif method == 'POST':
+                status, result = api.post(path, data)
+            else:
+                status, result = api.delete(path)
+
+        self._send(status, result)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class StubAPI(object):
+    """Serves seeded collections and records every request it receives in
+    :attr:`requests` as (method, path, query) tuples. Failures (ie.
+    throttling) can be injected with :meth:`throttle`, and every request is
+    delayed by ``latency`` seconds. Without ``date_ranges``, searching by a
+    date range fails, like on API versions which don't support it."""
+
+    def __init__(self, latency=0, date_ranges=True):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.api = self
+        self.base_url = 'http://127.0.0.1:{}/v1'.format(self.server.server_address[1])
+        self.latency = latency
+        self.date_ranges = date_ranges
+        self.collections = {}
+        self.resources = {}
+        self.requests = []
+        self.faults = []
+        self.version = 0
+        self.lock = threading.RLock()
+        self._ids = 0
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def throttle(self, count, status=429, retry_after=None):
+        """Fails the next ``count`` requests with ``status``, optionally with
+        a Retry-After header."""
+        with self.lock:
+            self.faults.extend([(status, retry_after)] * count)
+
+    def next_fault(self):
+        with self.lock:
+            return self.faults.pop(0) if self.faults else None
+
+    def href(self, path):
+        return self.base_url + path
+
+    def path(self, href):
+        return href[len(self.base_url):] if href.startswith(self.base_url) else href
+
+    def collection(self, path):
+        with self.lock:
+            if path not in self.collections:
+                self.collections[path] = Collection(self, path)
+
+            return self.collections[path]
+
+    def add_links(self, item, collection_path):
+        kind = collection_path.rsplit('/', 1)[-1]
+        for link in LINKS.get(kind, ()):
+            item.setdefault(link, {'href': item['href'] + '/' + link})
+
+        parent, _, _ = collection_path.rpartition('/')
+        if kind in ('accounts', 'groups') and parent.startswith('/directories/'):
+            item.setdefault('directory', {'href': self.href(parent)})
+
+        item.setdefault('tenant', {'href': self.href(TENANT)})
+
+    def seed(self, path, count, **attrs):
+        """Adds ``count`` synthetic resources to the collection at ``path``.
+        They're generated when requested, so seeding millions is cheap.
+        String attributes can contain '{i}', replaced by the resource index
+        (ie. email='user{i}@example.com'). All seeded resources of a
+        collection share the same attributes."""
+        coll = self.collection(path)
+        with self.lock:
+            coll.attrs.update(attrs)
+            coll.synthetic += count
+            self.version += 1
+
+        return self.href(path)
+
+    def add(self, path, data):
+        """Creates a resource in the collection at ``path``."""
+        kind = path.rsplit('/', 1)[-1]
+        self._ids += 1
+        now = _timestamp(datetime.utcnow())
+
+        item = dict(data, href=self.href('/{}/new{}'.format(kind, self._ids)), createdAt=now, modifiedAt=now)
+        if kind == 'accounts':
+            item.setdefault('status', 'ENABLED')
+        self.add_links(item, path)
+
+        self.resources[item['href']] = item
+        self.collection(path).hrefs.append(item['href'])
+
+        if kind == 'groupMemberships':
+            account, group = item['account']['href'], item['group']['href']
+            self.collection(self.path(group) + '/accounts').hrefs.append(account)
+            self.collection(self.path(account) + '/groups').hrefs.append(group)
+            self.collection(self.path(group) + '/accountMemberships').hrefs.append(item['href'])
+            self.collection(self.path(account) + '/groupMemberships').hrefs.append(item['href'])
+        elif kind == 'accountStoreMappings':
+            app = self.path(item['application']['href'])
+            if path != app + '/accountStoreMappings':
+                self.collection(app + '/accountStoreMappings').hrefs.append(item['href'])
+
+        self.version += 1
+        return item
+
+    def find(self, href):
+        """Gets a resource by href, or None."""
+        if href in self.resources:
+            return self.resources[href]
+
+        path, _, i = self.path(href).rpartition('/')
+        coll = self.collections.get(path)
+        if coll and i.isdigit() and int(i) < coll.synthetic and int(i) not in coll.deleted:
+            return coll.item(int(i))
+
+    def expand(self, item, expand):
+        """Replaces the links named in ``expand`` (ie. 'directory,groups(limit:5)')
+        with the resources or collection pages they link to."""
+        expanded = dict(item)
+        for name, options in re.findall(r'(\w+)(?:\(([^)]*)\))?', expand):
+            link = item.get(name)
+            if isinstance(link, dict) and 'href' in link:
+                params = dict(o.split(':', 1) for o in options.split(',') if ':' in o)
+                status, value = self.get(self.path(link['href']), params)
+                if status == 200:
+                    expanded[name] = value
+
+        return expanded
+
+    def get(self, path, query):
+        href = self.href(path)
+        expand = query.get('expand')
+
+        if path == TENANT:
+            tenant = {'href': href, 'name': 'stub', 'key': 'stub'}
+            for name in ('applications', 'directories', 'accounts', 'groups'):
+                tenant[name] = {'href': self.href('/' + name)}
+            return 200, tenant
+
+        item = self.find(href)
+        if item is not None:
+            return 200, self.expand(item, expand) if expand else item
+
+        if path.endswith('/customData'):
+            return 200, {'href': href}
+
+        if path not in self.collections and path.rsplit('/', 1)[-1] not in COLLECTIONS:
+            return _error(404, 'The requested resource does not exist.')
+
+        coll = self.collection(path)
+        filters = [(k, v) for k, v in query.items() if k not in CONTROL_PARAMS]
+        if not self.date_ranges and any(_is_range(v) for _, v in filters):
+            return _error(400, 'Invalid query parameter value.')
+
+        order_by = query.get('orderBy')
+        items = coll.search(filters, order_by) if filters or order_by else coll
+
+        offset = int(query.get('offset', 0))
+        limit = min(int(query.get('limit', 25)), 100)
+
+        return 200, {
+            'href': href,
+            'offset': offset,
+            'limit': limit,
+            'size': len(items),
+            'items': [self.expand(items[i], expand) if expand else items[i]
+                for i in range(offset, min(offset + limit, len(items)))],
+        }
+
+    def post(self, path, data):
+        """Creates a resource when posting to a collection, updates it when
+        posting to a resource."""
+        href = self.href(path)
+        item = self.find(href)
+
+        if item is None:
+            if path.rsplit('/', 1)[-1] not in COLLECTIONS:
+                return _error(404, 'The requested resource does not exist.')
+
+            return 201, self.add(path, data)
+
+        item = dict(item, **data)
+        item['modifiedAt'] = _timestamp(datetime.utcnow())
+        self.resources[href] = item
+        self.version += 1
+
+        return 200, item
+
+    def delete(self, path):
+        href = self.href(path)
+        if self.find(href) is None:
+            return _error(404, 'The requested resource does not exist.')
+
+        for coll in list(self.collections.values()):
+            coll.remove(href)
+
+        self.resources.pop(href, None)
+        self.version += 1
+
+        return 204, None
+
+
+class StubStore(object):
+    """The data store methods the CLI uses directly, backed by a StubAPI."""
+
+    def __init__(self):
+        self.session = Session()
+
+        # where the scheduler finds the SDK's session
+        self.executor = self
+
+    def _request(self, method, href, **kwargs):
+        from stormpath.error import Error
+
+        response = self.session.request(method, href, **kwargs)
+        if response.status_code >= 400:
+            raise Error(response.json(), response.status_code)
+
+        return response.json()
+
+    def get_resource(self, href, params=None):
+        return self._request('GET', href, params=params)
+
+    def create_resource(self, href, data, params=None):
+        return self._request('POST', href, json=data, params=params)
+
+
+class StubCollection(object):
+    """A collection which can only be queried and paged."""
+
+    def __init__(self, client, href, query=None):
+        self._client = client
+        self._store = client.data_store
+        self._query = query
+        self.href = href
+
+    def query(self, **kwargs):
+        return StubCollection(self._client, self.href, kwargs)
+
+
+class StubClient(object):
+    """A client of a StubAPI's tenant."""
+
+    def __init__(self, api):
+        self.data_store = StubStore()
+        for name in ('applications', 'directories', 'groups', 'accounts'):
+            setattr(self, name, StubCollection(self, api.href('/' + name)))
+
+        self.group_memberships = StubCollection(self, api.href('/groupMemberships'))
+        self.account_store_mappings = StubCollection(self, api.href('/accountStoreMappings'))
+
+    def close(self):
+        self.data_store.session.close()
@@ -1,14 +1,22 @@
+import json
+import os
+import shutil
+import tempfile
 import unittest
 
 try:
-    from mock import MagicMock
+    from mock import MagicMock, patch
 except ImportError:
-    from unittest.mock import MagicMock
+    from unittest.mock import MagicMock, patch
 
-from stormpath_cli import actions
+from stormpath_cli import actions, resources
+from stormpath.client import Client
 from stormpath.resources.account import AccountList
+from stormpath.resources.account_store_mapping import AccountStoreMappingList
 from stormpath.resources.application import ApplicationList
 
+from stub_api import StubAPI
+
 
 class TestActions(unittest.TestCase):
 
@@ -61,3 +69,222 @@ class TestActions(unittest.TestCase):
         del resource.add_group
         ret = actions._add_resource_to_groups(resource, args)
         self.assertIsNone(ret)
+
+    def test_links_left_out_by_fields_are_not_expanded(self):
+        args = {'--expand': 'customData,groups(offset:0,limit:25),directory'}
+        self.assertEqual(actions._expand(args, ['email', 'groups', 'customData']), 'customData,groups(offset:0,limit:25)')
+        self.assertIsNone(actions._expand(args, ['email']))
+        self.assertEqual(actions._expand(args, []), args['--expand'])
+
+    def test_group_names_are_resolved_once_and_failures_reported(self):
+        directory = MagicMock()
+        directory.groups.href = 'directories/1/groups'
+        directory.groups.query.side_effect = lambda name: [MagicMock(href='groups/' + name)] if name != 'missing' else []
+
+        def add_group(group):
+            if not group.startswith('groups/'):
+                raise ValueError('No such group.')
+
+        accounts = [MagicMock(directory=directory) for _ in range(3)]
+        accounts[2].add_group.side_effect = add_group
+
+        with patch.dict(resources._group_hrefs, clear=True), patch.object(actions, 'schedule_client') as schedule:
+            for account in accounts[:2]:
+                actions._add_resource_to_groups(account, {'--groups': 'admins, users', '--workers': '2'})
+
+            schedule.assert_called_with(accounts[1]._client, 2)
+            self.assertEqual(directory.groups.query.call_count, 2)
+            self.assertEqual(sorted(c[0][0] for c in accounts[1].add_group.call_args_list), ['groups/admins', 'groups/users'])
+
+            with self.assertRaises(ValueError) as ctx:
+                actions._add_resource_to_groups(accounts[2], {'--groups': 'admins,missing'})
+
+        self.assertEqual(str(ctx.exception), 'Unable to add the resource to 1 of 2 groups: missing.')
+        accounts[2].add_group.assert_any_call('missing')
+
+
+class TestListResources(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubAPI().start()
+        self.client = Client(id='id', secret='secret', base_url=self.api.base_url)
+
+    def tearDown(self):
+        self.api.stop()
+
+    def _list_accounts(self, count):
+        href = self.api.seed('/accounts', count, email='test@example.com')
+        coll = AccountList(self.client, href=href)
+        return list(actions.list_resources(coll, {'<attributes>': []}))
+
+    def test_listing_makes_one_request_per_page(self):
+        rows = self._list_accounts(250)
+        self.assertEqual(len(rows), 250)
+        self.assertEqual(rows[0], self.api.collections['/accounts'][0])
+        self.assertEqual(len(self.api.requests), 3)
+
+    def test_listing_empty_collection_makes_a_single_request(self):
+        rows = self._list_accounts(0)
+        self.assertEqual(rows, [])
+        self.assertEqual(len(self.api.requests), 1)
+
+    def test_limited_listing_makes_a_single_request(self):
+        href = self.api.seed('/accounts', 1000000, email='user{i}@example.com')
+        coll = AccountList(self.client, href=href)
+
+        rows = list(actions.list_resources(coll, {'<attributes>': [], '--limit': '10', '--offset': '100'}))
+        self.assertEqual([r['email'] for r in rows], ['user{}@example.com'.format(i) for i in range(100, 110)])
+        self.assertEqual(len(self.api.requests), 1)
+
+    def test_listing_expands_links_in_the_page_request(self):
+        self.api.seed('/directories', 1)
+        href = self.api.seed('/directories/0/accounts', 150)
+        coll = AccountList(self.client, href=href)
+
+        rows = list(actions.list_resources(coll, {'<attributes>': [], '--expand': 'directory'}))
+        self.assertEqual(rows[149]['directory']['name'], 'directories-0')
+        self.assertEqual([q.get('expand') for _, _, q in self.api.requests], ['directory', 'directory'])
+
+
+class TestImportResources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.coll = AccountList(MagicMock(), href='test/accounts')
+        self.coll.create = MagicMock(side_effect=self._create)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _create(self, attrs):
+        if attrs['email'] == 'taken@example.com':
+            raise ValueError('Account already exists.')
+
+        return MagicMock(href='accounts/' + attrs['email'])
+
+    def _import(self, name, data, **args):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as fd:
+            fd.write(data)
+
+        args.setdefault('--workers', '4')
+        ret = actions.import_resources(self.coll, dict(args, **{'<attributes>': [path]}))
+
+        with open(ret['results']) as fd:
+            return ret, [json.loads(line) for line in fd]
+
+    def test_importing_csv_maps_columns_to_attributes(self):
+        ret, results = self._import('accounts.csv', (
+            'email,givenName,surname,password,middle-name\n'
+            'a@example.com,Ann,Smith,Secret123,\n'
+            'taken@example.com,Bob,Smith,Secret123,J\n'
+            'c@example.com,Cid,,Secret123,\n'))
+
+        self.assertEqual((ret['created'], ret['failed']), (1, 2))
+        self.coll.create.assert_any_call({'email': 'a@example.com', 'given_name': 'Ann', 'surname': 'Smith', 'password': 'Secret123'})
+        self.assertEqual([r['row'] for r in results], [1, 2, 3])
+        self.assertEqual(results[0]['href'], 'accounts/a@example.com')
+        self.assertEqual(results[1]['error'], 'Account already exists.')
+        self.assertEqual(results[2]['error'], 'Missing required attributes: surname.')
+
+    def test_importing_jsonl_adds_accounts_to_groups(self):
+        account = MagicMock(href='accounts/1')
+        self.coll.create = MagicMock(return_value=account)
+
+        ret, results = self._import('accounts.jsonl', (
+            '{"email": "a@example.com", "given_name": "Ann", "surname": "Smith", "password": "x", "groups": ["admins"]}\n'
+            '{"email": "b@example.com", "nickname": "B"}\n'), **{'--groups': 'users'})
+
+        self.assertEqual((ret['created'], ret['failed']), (1, 1))
+        self.assertEqual(sorted(c[0][0] for c in account.add_group.call_args_list), ['admins', 'users'])
+        self.assertEqual(results[1]['error'], 'Unknown resource attribute: nickname')
+
+
+class TestDeleteMatchingResources(unittest.TestCase):
+
+    def setUp(self):
+        self.coll = AccountList(MagicMock(), href='test/accounts')
+        self.coll.query = MagicMock(return_value=self.coll)
+        self.coll.resource_class = MagicMock()
+        self.rows = [{'href': 'accounts/{}'.format(i)} for i in range(5)]
+
+    def _delete(self, args, answer='y'):
+        args = dict({'<attributes>': [], '--all-matching': True, '--status': 'DISABLED'}, **args)
+        with patch.object(actions, 'iter_collection_data', return_value=iter(self.rows)), \
+                patch.object(actions, 'invalidate') as invalidate, \
+                patch.object(actions, 'input', return_value=answer) as prompt:
+            return actions.delete_resource(self.coll, args), prompt, invalidate
+
+    def test_deleting_all_matches_after_confirmation(self):
+        ret, prompt, invalidate = self._delete({'--workers': '3'})
+
+        self.coll.query.assert_called_once_with(status='DISABLED')
+        prompt.assert_called_once_with('Delete 5 matching resources [y/N]? ')
+        self.assertEqual(ret, {'deleted': 5, 'failed': 0})
+        self.assertEqual(sorted(c[1]['href'] for c in self.coll.resource_class.call_args_list), [r['href'] for r in self.rows])
+        self.assertEqual(invalidate.call_count, 5)
+
+    def test_nothing_is_deleted_without_confirmation(self):
+        ret, prompt, invalidate = self._delete({}, answer='n')
+        self.assertIsNone(ret)
+        self.assertFalse(self.coll.resource_class.called)
+
+        self.assertRaises(ValueError, self._delete, {'--no-prompt': True})
+
+    def test_failed_deletes_are_counted(self):
+        resources = [MagicMock() for _ in self.rows]
+        resources[2].delete.side_effect = ValueError('Not found.')
+        self.coll.resource_class.side_effect = resources
+
+        ret, prompt, invalidate = self._delete({'--force': True, '--workers': '1'})
+        self.assertFalse(prompt.called)
+        self.assertEqual(ret, {'deleted': 4, 'failed': 1})
+
+    def test_deleting_requires_a_search_option(self):
+        self.assertRaises(ValueError, self._delete, {'--status': None, '--force': True})
+        self.assertFalse(self.coll.resource_class.called)
+
+    def test_mappings_are_never_deleted_by_search(self):
+        self.coll = AccountStoreMappingList(MagicMock(), href='test/mappings')
+        self.coll.resource_class = MagicMock()
+
+        self.assertRaises(ValueError, self._delete, {'--force': True})
+        self.assertFalse(self.coll.resource_class.called)
+
+
+class TestUpdateMatchingResources(unittest.TestCase):
+
+    def setUp(self):
+        self.coll = AccountList(MagicMock(), href='test/accounts')
+        self.coll.query = MagicMock(return_value=self.coll)
+        self.rows = [
+            {'href': 'accounts/0', 'status': 'ENABLED'},
+            {'href': 'accounts/1', 'status': 'DISABLED'},
+            {'href': 'accounts/2', 'status': 'ENABLED'},
+        ]
+
+    def _update(self, args):
+        args = dict({'<attributes>': ['status=DISABLED'], '--all-matching': True, '--query': 'smith', '--force': True}, **args)
+        with patch.object(actions, 'iter_collection_data', return_value=iter(self.rows)), \
+                patch.object(actions, 'save_resource_data') as save, \
+                patch.object(actions, 'invalidate'):
+            return actions.update_resource(self.coll, args), save
+
+    def test_only_changed_resources_are_saved(self):
+        ret, save = self._update({'--workers': '2'})
+
+        self.coll.query.assert_called_once_with(q='smith')
+        self.assertEqual(ret, {'updated': 2, 'unchanged': 1, 'failed': 0})
+        self.assertEqual(sorted(c[0][1] for c in save.call_args_list), ['accounts/0', 'accounts/2'])
+        save.assert_any_call(self.coll, 'accounts/0', {'status': 'DISABLED'})
+
+    def test_patch_is_required_and_validated(self):
+        self.assertRaises(ValueError, self._update, {'<attributes>': []})
+        self.assertRaises(ValueError, self._update, {'<attributes>': ['nickname=x']})
+        self.assertRaises(ValueError, self._update, {'--force': False, '--no-prompt': True})
+
+    def test_updating_requires_a_search_option(self):
+        self.assertRaises(ValueError, self._update, {'--query': None})
+
+        self.coll = AccountStoreMappingList(MagicMock(), href='test/mappings')
+        self.assertRaises(ValueError, self._update, {'<attributes>': ['is_default_account_store=true']})
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from docopt import DocoptExit, docopt
+
+from stormpath_cli import arguments
+from stormpath_cli.main import __doc__ as doc
+from stormpath_cli.util import get_config_path
+
+
+ARGVS = [
+    [],
+    ['list', 'accounts', '-A', 'foo'],
+    ['create', 'account', '-e', 'a@b.c', '--given-name', 'A', '-G', 'x,y', 'username=test'],
+    ['delete', 'application', 'My App', '--force', '--output-json'],
+    ['set', 'directory', '--href', 'https://api.stormpath.com/v1/directories/x'],
+]
+
+
+class TestArguments(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.saved_home = os.environ.get('HOME')
+        os.environ['HOME'] = self.home
+        arguments._grammars.clear()
+
+    def tearDown(self):
+        os.environ['HOME'] = self.saved_home
+        shutil.rmtree(self.home)
+        arguments._grammars.clear()
+
+    def test_parsing_matches_docopt(self):
+        for argv in ARGVS:
+            self.assertEqual(arguments.parse_arguments(doc, argv), docopt(doc, argv))
+
+    def test_grammar_is_cached_between_processes(self):
+        arguments.parse_arguments(doc, ARGVS[1])
+        self.assertTrue(os.path.exists(get_config_path(arguments.GRAMMAR_FILE)))
+
+        arguments._grammars.clear()
+        saved = arguments.compile_grammar
+        arguments.compile_grammar = None  # must not be needed anymore
+        try:
+            for argv in ARGVS:
+                self.assertEqual(arguments.parse_arguments(doc, argv), docopt(doc, argv))
+        finally:
+            arguments.compile_grammar = saved
+
+    def test_changed_usage_invalidates_the_cache(self):
+        arguments.parse_arguments(doc, [])
+        arguments._grammars.clear()
+        other = doc.replace('-F, --force', '-X, --force')
+        self.assertTrue(arguments.parse_arguments(other, ['delete', '-X'])['--force'])
+
+    def test_parsed_arguments_dont_share_state(self):
+        args = arguments.parse_arguments(doc, [])
+        args['<attributes>'].append('name=test')
+        self.assertEqual(arguments.parse_arguments(doc, [])['<attributes>'], [])
+
+    def test_invalid_arguments_raise_docopt_exit(self):
+        self.assertRaises(DocoptExit, arguments.parse_arguments, doc, ['--no-such-option'])
+
+    def test_index_is_disabled_by_default(self):
+        from stormpath_cli.resources import index_ttl
+        self.assertEqual(index_ttl(arguments.parse_arguments(doc, ['list', 'accounts', '-A', 'foo'])), 0)
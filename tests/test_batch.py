@@ -0,0 +1,108 @@
+import json
+import time
+import unittest
+
+from six import StringIO
+
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from stormpath_cli import batch, main, scheduler
+from stormpath_cli.concurrency import bounded_map
+
+from stub_api import StubAPI, StubClient
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_parsing_command_lines(self):
+        args = batch.parse_batch_line("create account -e 'a@example.com' -p Secret123", {})
+        self.assertEqual(args['<action>'], 'create')
+        self.assertEqual(args['--email'], 'a@example.com')
+        self.assertTrue(args['--no-prompt'])
+
+    def test_parsing_json_lines(self):
+        args = batch.parse_batch_line(json.dumps({
+            'action': 'create', 'resource': 'account', 'email': 'a@example.com',
+            'groups': ['admins', 'users'], 'force': True, 'username': None,
+            'attributes': {'givenName': 'Ann'}}), {})
+        self.assertEqual(args['<resource>'], 'account')
+        self.assertEqual(args['--email'], 'a@example.com')
+        self.assertEqual(args['--groups'], 'admins,users')
+        self.assertTrue(args['--force'])
+        self.assertIsNone(args['--username'])
+        self.assertEqual(args['<attributes>'], ['givenName=Ann'])
+
+        args = batch.parse_batch_line('["delete", "group", "--name", "old", "--force"]', {})
+        self.assertEqual(args['<action>'], 'delete')
+        self.assertEqual(args['--name'], 'old')
+
+    def test_invalid_lines_raise_value_errors(self):
+        self.assertRaises(ValueError, batch.parse_batch_line, '{"action": ', {})
+        self.assertRaises(ValueError, batch.parse_batch_line, 'list --no-such-option', {})
+        self.assertIsNone(batch.parse_batch_line('# a comment', {}))
+
+    def test_batch_writes_a_status_per_command(self):
+        def execute(arguments, get_client):
+            if arguments['<resource>'] == 'groups':
+                raise ValueError('No such group.')
+            return True, (r for r in [{'name': 'app', 'href': 'https://api/app', 'tenant': {'href': 'x'}}])
+
+        out = StringIO()
+        source = StringIO('list applications\n\n# skipped\nlist groups\n{"action": "batch"}\n')
+
+        with patch.object(batch.sys, 'stdin', source), \
+                patch.object(main, 'execute_command', side_effect=execute), \
+                patch.object(main, 'shared_client_factory', return_value=MagicMock()):
+            self.assertFalse(batch.run_batch({'<resource>': '-', '--workers': '2'}, out=out))
+
+        statuses = [json.loads(l) for l in out.getvalue().splitlines()]
+        self.assertEqual([s['line'] for s in statuses], [1, 4, 5])
+        self.assertEqual(statuses[0], {'line': 1, 'status': 'ok', 'result': [{'name': 'app', 'href': 'https://api/app'}]})
+        self.assertEqual(statuses[1]['error'], 'No such group.')
+        self.assertEqual(statuses[2]['status'], 'error')
+
+    def test_batch_requests_overlap(self):
+        api = StubAPI(latency=0.2).start()
+        self.addCleanup(api.stop)
+
+        def execute(arguments, get_client):
+            get_client(arguments).data_store.get_resource(api.href('/accounts'))
+            return True, None
+
+        clients = []
+
+        def create_client(arguments):
+            clients.append(StubClient(api))
+            self.addCleanup(clients[-1].close)
+            return clients[-1]
+
+        start = time.time()
+        with patch.object(batch.sys, 'stdin', StringIO('list accounts\n' * 4)), \
+                patch.object(main, 'execute_command', side_effect=execute), \
+                patch.object(main, 'create_client', side_effect=create_client), \
+                patch.object(main, 'init_auth', return_value={}), \
+                patch.object(scheduler, '_scheduler', None):
+            self.assertTrue(batch.run_batch({'<resource>': '-', '--workers': '4'}, out=StringIO()))
+
+        # a window of one request would take 0.8s
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(len(clients), 1)
+        self.assertEqual(len(api.requests), 4)
+
+
+class TestBoundedMap(unittest.TestCase):
+
+    def test_results_keep_input_order_and_capture_errors(self):
+        def func(n):
+            if n == 3:
+                raise ValueError(n)
+            return n * 2
+
+        for workers in (1, 4):
+            results = list(bounded_map(func, iter(range(10)), workers))
+            self.assertEqual([r[0] for r in results], list(range(10)))
+            self.assertEqual(results[2][1:], (4, None))
+            self.assertIsInstance(results[3][2], ValueError)
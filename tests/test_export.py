@@ -0,0 +1,100 @@
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import exists, join
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from stormpath_cli import export
+
+
+def _items(name, count):
+    return [{'href': '/{}/{}'.format(name, i), 'name': '{}-{}'.format(name, i)} for i in range(count)]
+
+
+class FakeAPI(object):
+    """Pages collections (lists of items) two items at a time, failing after
+    ``fail_after`` pages if set."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.offsets = []
+
+    def iter_collection_pages(self, collection, offset=0, prefetch=0):
+        while True:
+            if self.fail_after is not None and len(self.offsets) >= self.fail_after:
+                raise IOError('Connection reset.')
+
+            self.offsets.append(offset)
+            yield {'offset': offset, 'items': collection[offset:offset + 2]}
+            if offset >= len(collection):
+                return
+            offset += 2
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.args = {'<resource>': self.path, '--prefetch': '0'}
+        self.tasks = [('applications', _items('applications', 3)), ('directories', _items('directories', 2)),
+            ('accountStoreMappings', _items('mappings', 1)), ('accountStoreMappings', _items('mappings2', 2))]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _export(self, api):
+        with patch.object(export, 'iter_collection_pages', api.iter_collection_pages), \
+                patch.object(export, '_tasks', lambda client, path: iter(self.tasks)):
+            return export.export_tenant(None, self.args)
+
+    def test_export_writes_shards_and_checkpoint(self):
+        ret = self._export(FakeAPI())
+
+        self.assertEqual(ret['applications'], 3)
+        self.assertEqual(ret['accountStoreMappings'], 3)
+        self.assertEqual(list(export.read_shards(self.path, 'applications')), _items('applications', 3))
+        self.assertEqual(list(export.read_shards(self.path, 'directories')), _items('directories', 2))
+        self.assertEqual(list(export.read_shards(self.path, 'accountStoreMappings')),
+            _items('mappings', 1) + _items('mappings2', 2))
+
+        with open(join(self.path, export.CHECKPOINT_FILE)) as fd:
+            self.assertTrue(json.load(fd)['done'])
+
+    def test_export_resumes_from_checkpoint(self):
+        self.assertRaises(IOError, self._export, FakeAPI(fail_after=4))
+
+        checkpoint = export.Checkpoint(self.path)
+        self.assertEqual((checkpoint.collection, checkpoint.offset), ('directories', 2))
+
+        # a page written after the last checkpoint is dropped on resume
+        with open(join(self.path, export.shard_name('directories', 0)), 'ab') as fd:
+            export._write_page(fd, [{'href': 'partial'}])
+
+        api = FakeAPI()
+        ret = self._export(api)
+
+        self.assertEqual(api.offsets[0], 2)
+        self.assertEqual(ret['directories'], 2)
+        self.assertEqual(list(export.read_shards(self.path, 'applications')), _items('applications', 3))
+        self.assertEqual(list(export.read_shards(self.path, 'directories')), _items('directories', 2))
+
+    def test_export_rotates_shards(self):
+        with patch.object(export, 'SHARD_ROWS', 2):
+            self._export(FakeAPI())
+
+        self.assertTrue(exists(join(self.path, export.shard_name('applications', 1))))
+        self.assertFalse(exists(join(self.path, export.shard_name('applications', 2))))
+        self.assertEqual(list(export.read_shards(self.path, 'applications')), _items('applications', 3))
+
+    def test_completed_export_is_not_repeated(self):
+        self._export(FakeAPI())
+        self.assertRaises(ValueError, self._export, FakeAPI())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from stormpath_cli import index
+
+
+class TestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.saved_home = os.environ.get('HOME')
+        os.environ['HOME'] = self.home
+        index._index = None
+
+    def tearDown(self):
+        os.environ['HOME'] = self.saved_home
+        shutil.rmtree(self.home)
+        index._index = None
+
+    def test_stored_hrefs_are_found_by_later_processes(self):
+        index.store('key applications', 'name', 'test', 'https://api/applications/1', 60)
+        index._index = None
+        self.assertEqual(index.lookup('key applications', 'name', 'test'), 'https://api/applications/1')
+        self.assertIsNone(index.lookup('other applications', 'name', 'test'))
+
+    def test_expired_entries_are_ignored_and_evicted(self):
+        with patch.object(index, 'time', return_value=1000):
+            index.store('key applications', 'name', 'old', 'https://api/applications/1', 60)
+
+        with patch.object(index, 'time', return_value=1061):
+            self.assertIsNone(index.lookup('key applications', 'name', 'old'))
+            index.store('key applications', 'name', 'new', 'https://api/applications/2', 60)
+
+        index._index = None
+        self.assertEqual(list(index._load().keys()), ['key applications\tname\tnew'])
+
+    def test_invalidating_an_href(self):
+        index.store('key applications', 'name', 'test', 'https://api/applications/1', 60)
+        index.invalidate('https://api/applications/1')
+        index._index = None
+        self.assertIsNone(index.lookup('key applications', 'name', 'test'))
+
+    def test_forgetting_a_name(self):
+        index.store('key applications', 'name', 'test', 'https://api/applications/1', 60)
+        index.store('key applications', 'name', 'other', 'https://api/applications/2', 60)
+        index.forget('key applications', 'name', 'test')
+        index._index = None
+        self.assertIsNone(index.lookup('key applications', 'name', 'test'))
+        self.assertEqual(index.lookup('key applications', 'name', 'other'), 'https://api/applications/2')
+
+    def test_clearing_the_index(self):
+        index.store('key applications', 'name', 'test', 'https://api/applications/1', 60)
+        self.assertTrue(index.clear())
+        self.assertIsNone(index.lookup('key applications', 'name', 'test'))
+        self.assertFalse(index.clear())
@@ -0,0 +1,65 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import abspath, dirname
+
+
+#: Modules which local actions must not import.
+HEAVY_MODULES = ('stormpath', 'pyquery', 'requests', 'termcolor')
+
+#: Cumulative import time budget for stormpath_cli.main, in microseconds.
+IMPORT_BUDGET = 150000
+
+LOCAL_COMMAND = """
+import sys
+sys.argv = ['stormpath'] + sys.argv[1:]
+from stormpath_cli.main import main
+try:
+    main()
+finally:
+    print(' '.join(sorted(sys.modules)))
+"""
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = dict(os.environ, HOME=self.home, PYTHONPATH=dirname(dirname(abspath(__file__))))
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def _run(self, *args, **kwargs):
+        cmd = [sys.executable] + list(kwargs.get('flags', [])) + ['-c', LOCAL_COMMAND] + list(args)
+        proc = subprocess.Popen(cmd, env=self.env, cwd=self.home, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        out, err = proc.communicate(b'')
+        return out.decode('utf-8'), err.decode('utf-8')
+
+    def test_local_actions_dont_import_the_sdk(self):
+        for action in ('context', 'unset', 'help', 'flush'):
+            out, _ = self._run(action)
+            modules = out.split()
+            heavy = [m for m in modules if m.split('.')[0] in HEAVY_MODULES]
+            self.assertEqual(heavy, [], action)
+
+    def test_project_actions_dont_import_the_sdk(self):
+        # there's no project to run or deploy here, they only get as far as
+        # failing to find one (or the tools they need)
+        for action in ('run', 'deploy'):
+            out, err = self._run(action)
+            sdk = [m for m in out.split() if m.split('.')[0] == 'stormpath']
+            self.assertEqual(sdk, [], action)
+            self.assertNotIn("No module named 'stormpath'", err, action)
+
+    @unittest.skipIf(sys.version_info < (3, 7), '-X importtime requires Python 3.7+')
+    def test_import_time_budget(self):
+        _, err = self._run('context', flags=['-X', 'importtime'])
+        times = re.findall(r'import time:\s+\d+ \|\s+(\d+) \| stormpath_cli\.main$', err, re.M)
+        self.assertEqual(len(times), 1)
+        self.assertLess(int(times[0]), IMPORT_BUDGET)
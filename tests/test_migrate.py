@@ -0,0 +1,141 @@
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+from stormpath_cli import migrate
+from stormpath_cli.main import execute_command
+from stub_api import StubAPI, StubClient
+
+
+class TestMigrate(unittest.TestCase):
+
+    def setUp(self):
+        self.source_api = StubAPI().start()
+        self.target_api = StubAPI().start()
+
+        api = self.source_api
+        api.seed('/applications', 1)
+        api.seed('/directories', 2)
+        api.seed('/groups', 2, directory={'href': api.href('/directories/0')})
+        api.seed('/accounts', 5, email='user{i}@example.com', givenName='Given{i}', surname='Surname{i}',
+            directory={'href': api.href('/directories/1')})
+        api.post('/groupMemberships', {'account': {'href': api.href('/accounts/3')}, 'group': {'href': api.href('/groups/1')}})
+        api.post('/accountStoreMappings', {'application': {'href': api.href('/applications/0')},
+            'accountStore': {'href': api.href('/directories/0')}, 'listIndex': 0, 'isDefaultAccountStore': True})
+
+        # the target already has a directory named like the first one
+        self.target_api.seed('/directories', 1)
+
+        self.source = StubClient(self.source_api)
+        self.target = StubClient(self.target_api)
+
+        self.path = tempfile.mkdtemp()
+        self.args = {'<resource>': join(self.path, 'journal.jsonl'), '--password': 'Secret1!', '--prefetch': '0'}
+
+    def tearDown(self):
+        self.source.close()
+        self.target.close()
+        self.source_api.stop()
+        self.target_api.stop()
+        shutil.rmtree(self.path)
+
+    def _journal(self):
+        with open(self.args['<resource>']) as fd:
+            return [json.loads(line) for line in fd]
+
+    def test_migrating_copies_resources_in_dependency_order(self):
+        ret = migrate.migrate_tenant(self.source, self.target, self.args)
+
+        self.assertEqual((ret['migrated'], ret['failed']), (12, 0))
+        self.assertEqual([e['stage'] for e in self._journal()],
+            ['applications', 'directories', 'directories', 'groups', 'groups'] + ['accounts'] * 5 +
+            ['groupMemberships', 'accountStoreMappings'])
+
+        hrefs = dict((e['source'], e['target']) for e in self._journal())
+        self.assertEqual(hrefs[self.source_api.href('/directories/0')], self.target_api.href('/directories/0'))
+
+        new_dir = self.target_api.path(hrefs[self.source_api.href('/directories/1')])
+        accounts = self.target_api.collection(new_dir + '/accounts')
+        self.assertEqual(sorted(a['email'] for a in accounts), ['user{}@example.com'.format(i) for i in range(5)])
+        self.assertEqual(set(a['password'] for a in accounts), set(['Secret1!']))
+
+        group = self.target_api.path(hrefs[self.source_api.href('/groups/1')])
+        self.assertEqual([a['href'] for a in self.target_api.collection(group + '/accounts')],
+            [hrefs[self.source_api.href('/accounts/3')]])
+
+        app = self.target_api.path(hrefs[self.source_api.href('/applications/0')])
+        mapping = self.target_api.collection(app + '/accountStoreMappings')[0]
+        self.assertEqual(mapping['accountStore']['href'], self.target_api.href('/directories/0'))
+        self.assertTrue(mapping['isDefaultAccountStore'])
+
+    def test_migrating_again_skips_migrated_resources(self):
+        migrate.migrate_tenant(self.source, self.target, self.args)
+        del self.target_api.requests[:]
+
+        ret = migrate.migrate_tenant(self.source, self.target, self.args)
+
+        self.assertEqual((ret['migrated'], ret['skipped']), (0, 12))
+        self.assertFalse([r for r in self.target_api.requests if r[0] == 'POST'])
+
+    def test_existing_resources_of_reused_resources_are_kept(self):
+        account = self.source_api.post('/accounts', {'email': 'Ann@example.com',
+            'directory': {'href': self.source_api.href('/directories/0')}})[1]
+        self.source_api.post('/groupMemberships', {'account': {'href': account['href']},
+            'group': {'href': self.source_api.href('/groups/1')}})
+
+        target = self.target_api
+        target.seed('/applications', 1)
+        group = target.post('/directories/0/groups', {'name': 'groups-1'})[1]
+        existing = target.post('/directories/0/accounts', {'email': 'ann@example.com'})[1]
+        target.post('/groupMemberships', {'account': {'href': existing['href']}, 'group': {'href': group['href']}})
+        target.post('/accountStoreMappings', {'application': {'href': target.href('/applications/0')},
+            'accountStore': {'href': target.href('/directories/0')}})
+        del target.requests[:]
+
+        ret = migrate.migrate_tenant(self.source, self.target, self.args)
+
+        self.assertEqual((ret['migrated'], ret['failed']), (14, 0))
+        entries = dict((e['source'], e) for e in self._journal())
+        self.assertEqual(entries[account['href']]['target'], existing['href'])
+        self.assertEqual(entries[self.source_api.href('/groups/1')]['target'], group['href'])
+        self.assertEqual([e.get('reused', False) for e in entries.values() if e['stage'] == 'groupMemberships'],
+            [False, True])
+        self.assertTrue([e for e in entries.values() if e['stage'] == 'accountStoreMappings'][0]['reused'])
+
+        posted = [path for method, path, query in target.requests if method == 'POST']
+        self.assertEqual(posted.count('/directories/0/groups'), 1)
+        self.assertNotIn('/directories/0/accounts', posted)
+        self.assertEqual(posted.count('/groupMemberships'), 1)
+        self.assertNotIn('/accountStoreMappings', posted)
+
+    def test_migrating_accounts_requires_a_password(self):
+        del self.args['--password']
+        self.assertRaises(ValueError, migrate.migrate_tenant, self.source, self.target, self.args)
+        self.assertFalse(self.target_api.requests)
+
+    def test_failed_resources_are_retried_with_their_dependents(self):
+        store = self.target.data_store
+        create = store.create_resource
+
+        def fail_once(href, data, params=None):
+            store.create_resource = create
+            raise ValueError('Connection reset.')
+
+        store.create_resource = fail_once
+
+        ret = migrate.migrate_tenant(self.source, self.target, self.args)
+        self.assertEqual((ret['migrated'], ret['failed']), (10, 1))
+        self.assertEqual([e['stage'] for e in self._journal() if 'error' in e], ['applications'])
+
+        ret = migrate.migrate_tenant(self.source, self.target, self.args)
+        self.assertEqual((ret['migrated'], ret['skipped'], ret['failed']), (2, 10, 0))
+
+    def test_migrating_requires_both_tenants(self):
+        args = {'<action>': 'migrate', '<resource>': None, '<attributes>': [], '--from-apikeyfile': 'a.properties'}
+        self.assertRaises(ValueError, execute_command, args, get_client=lambda args: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,6 +21,34 @@ class TestOutput(unittest.TestCase):
         ret = output._remove_links(data)
         self.assertEquals(ret, [{'name': 'test'}])
 
+    def test_show_links_helper(self):
+        data = [{'name': 'test', 'directory': {'href': 'dir', 'name': 'x'}, 'defaultAccountStoreMapping': None}]
+        ret = output._show_links(data)
+        self.assertEquals(ret, [{'name': 'test', 'directory': 'dir', 'defaultAccountStoreMapping': None}])
+
+    def test_project_row_does_not_modify_or_copy_the_original(self):
+        nested = {'href': 'dir'}
+        data = {'name': 'test', 'directory': nested, 'defaultGroupStoreMapping': None}
+        ret = output._project_row(data)
+        self.assertEquals(ret, {'name': 'test'})
+        self.assertEquals(data, {'name': 'test', 'directory': nested, 'defaultGroupStoreMapping': None})
+        self.assertIs(data['directory'], nested)
+
+    def test_expanded_links_are_kept(self):
+        groups = {'href': 'groups', 'size': 1, 'items': [{'href': 'group', 'name': 'admins'}]}
+        data = {'name': 'test', 'groups': groups, 'directory': {'href': 'dir'}}
+        expanded = output.expanded_attributes('groups(offset:0,limit:25),customData')
+
+        self.assertEqual(expanded, ('groups', 'customData'))
+        self.assertEqual(output._project_row(data, expanded=expanded), {'name': 'test', 'groups': groups})
+        self.assertEqual(output._project_row(data, show_links=True, expanded=expanded),
+            {'name': 'test', 'groups': groups, 'directory': 'dir'})
+
+    def test_expanded_links_are_json_in_tsv_output(self):
+        out = StringIO()
+        output._output_tsv([{'href': 'test', 'customData': {'href': 'cd', 'color': 'red'}}], show_headers=False, out=out)
+        self.assertEqual(out.getvalue(), '{"color": "red", "href": "cd"}\ttest\n')
+
     def test_format_row(self):
         data = {'href': 'test', 'testtest': 'test'}
         max_indent = len('testtest')
@@ -86,28 +114,116 @@ class TestOutput(unittest.TestCase):
         data = generate_data()
         output._output = MagicMock()
 
-        output.output(data)
+        saved_stdout = output.stdout
+        try:
+            output.stdout = MagicMock()
+            output.stdout.isatty.return_value = True
+            output.output(data)
+        finally:
+            output.stdout = saved_stdout
+
         self.assertEqual(output._output.call_count, 10)
         calls = []
         for i in range(10):
             calls.append(call(
                 {'href': 'test%s' % i}, output_json=False,
-                show_headers=False, show_links=False))
+                show_headers=False, show_links=False, expanded=()))
         output._output.assert_has_calls(calls)
 
+    def test_piped_output_with_generator_writes_a_single_header(self):
+        def generate_data():
+            for i in range(3):
+                yield {'href': 'test%s' % i, 'name': 'name%s' % i, 'directory': {'href': 'dir'}}
+
+        saved_stdout = output.stdout
+        try:
+            out = StringIO()
+            out.isatty = lambda: False
+            output.stdout = out
+            output.output(generate_data(), show_headers=True)
+        finally:
+            output.stdout = saved_stdout
+
+        self.assertEquals(out.getvalue(), 'href\tname\ntest0\tname0\ntest1\tname1\ntest2\tname2\n')
+
+    def test_piped_output_is_flushed_when_the_generator_fails(self):
+        def generate_data():
+            yield {'href': 'test0', 'name': 'name0'}
+            raise IOError('Connection reset.')
+
+        saved_stdout = output.stdout
+        try:
+            out = StringIO()
+            out.isatty = lambda: False
+            output.stdout = out
+            self.assertRaises(IOError, output.output, generate_data())
+        finally:
+            output.stdout = saved_stdout
+
+        self.assertEquals(out.getvalue(), 'test0\tname0\n')
+
+    def test_tsv_writer_keeps_the_first_schema_and_buffers_writes(self):
+        out = MagicMock()
+        writer = output.TsvWriter(show_headers=True, out=out, buffer_rows=2)
+        writer.write({'b': 'B', 'a': 'A'})
+        self.assertEqual(out.write.call_count, 1)
+        writer.write({'a': 'A2', 'c': 'C'})
+        writer.flush()
+        self.assertEqual(out.write.call_count, 2)
+        self.assertEqual(''.join(c[0][0] for c in out.write.call_args_list), 'a\tb\nA\tB\nA2\t\n')
+
+    def test_csv_writer_quotes_values(self):
+        out = StringIO()
+        writer = output.CsvWriter(out=out)
+        writer.write({'description': 'a, "b"', 'href': 'test'})
+        writer.flush()
+        self.assertEquals(out.getvalue(), '"a, ""b""",test\n')
+
     def test_output_with_generator_and_output_json(self):
         def generate_data():
             for i in range(10):
                 yield {'href': 'test%s' % i}
 
-        data = generate_data()
-        output._output = MagicMock()
+        saved = output._output_json_stream
+        try:
+            output._output_json_stream = MagicMock()
+            output.output(generate_data(), output_json=True)
+            self.assertEqual(output._output_json_stream.call_count, 1)
+            rows = output._output_json_stream.call_args[0][0]
+            self.assertNotIsInstance(rows, list)
+            self.assertEqual(list(rows), list(generate_data()))
+        finally:
+            output._output_json_stream = saved
+
+    def test_json_stream_output_matches_json_output(self):
+        data = [{'href': 'test%s' % i, 'description': 'line\nbreak'} for i in range(3)]
+        out = StringIO()
+        output._output_json_stream(iter(data), out=out)
+        self.assertEqual(out.getvalue(), json.dumps(data, indent=2, sort_keys=True) + '\n')
 
-        output.output(data, output_json=True)
-        self.assertEqual(output._output.call_count, 1)
-        output._output.assert_called_with(
-            list(generate_data()), output_json=True, show_headers=False,
-            show_links=False)
+    def test_json_stream_output_writes_each_resource_as_it_arrives(self):
+        out = StringIO()
+
+        def generate_data():
+            for i in range(3):
+                yield {'href': 'test%s' % i}
+                self.assertIn('"test%s"' % i, out.getvalue())
+
+        count = output._output_json_stream(generate_data(), out=out)
+        self.assertEqual(count, 3)
+        self.assertEqual(json.loads(out.getvalue()), list(generate_data()))
+
+    def test_json_stream_output_of_no_resources(self):
+        out = StringIO()
+        output._output_json_stream(iter([]), out=out)
+        self.assertEqual(json.loads(out.getvalue()), [])
+
+    def test_ndjson_output(self):
+        data = [{'href': 'test', 'description': 'test_description'}, {'href': 'test2'}]
+        out = StringIO()
+        count = output._output_ndjson(iter(data), out=out)
+        self.assertEqual(count, 2)
+        self.assertEqual([json.loads(l) for l in out.getvalue().splitlines()], data)
 
     def test_json_output_when_not_a_tty(self):
         data = [{'href': 'test', 'description': 'test_description'}]
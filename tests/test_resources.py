@@ -1,12 +1,16 @@
+import threading
 import unittest
 
 try:
-    from mock import MagicMock
+    from mock import MagicMock, patch
 except ImportError:
-    from unittest.mock import MagicMock
+    from unittest.mock import MagicMock, patch
 
 from stormpath_cli import resources
 from stormpath.client import Client
+from stormpath.resources.account import AccountList
+from stormpath.resources.account_store_mapping import AccountStoreMappingList
+from stormpath.resources.group import GroupList
 
 
 class TestResources(unittest.TestCase):
@@ -53,3 +57,178 @@ class TestResources(unittest.TestCase):
         args = {'--in-directory': 'test'}
         ret = resources._get_context(client, args)
         self.assertEquals(ret, fake_res)
+
+    def _stored(self, data):
+        resource = MagicMock(href=data.get('href'))
+        resource._store.get_resource.return_value = data
+        return resource
+
+    def test_find_resource_data_uses_the_index_when_enabled(self):
+        coll = MagicMock()
+        coll._client.auth.id = 'key'
+        coll.href = 'https://api.stormpath.com/v1/tenants/1/applications'
+        saved = resources.index
+        try:
+            resources.index = MagicMock()
+            resources.index.lookup.return_value = 'https://api.stormpath.com/v1/applications/1'
+            coll.get.return_value = self._stored({'name': 'Test'})
+            ret, data = resources.find_resource_data(coll, 'name', 'test', ttl=60)
+            coll.get.assert_called_once_with('https://api.stormpath.com/v1/applications/1')
+            self.assertFalse(coll.query.called)
+            self.assertEquals(ret, coll.get.return_value)
+            self.assertEquals(data, {'name': 'Test'})
+
+            # the data fetched for the index hit is the only request
+            self.assertEquals(ret._store.get_resource.call_count, 1)
+
+            resources.index.lookup.return_value = None
+            coll.query = lambda name=None: [self._stored({'href': 'found', 'name': 'test'})]
+            resources.find_resource_data(coll, 'name', 'test', ttl=60)
+            resources.index.store.assert_called_once_with(
+                'key ' + coll.href, 'name', 'test', 'found', 60)
+        finally:
+            resources.index = saved
+
+    def test_stale_index_entries_are_forgotten(self):
+        from stormpath.error import Error
+
+        coll = MagicMock()
+        coll._client.auth.id = 'key'
+        coll.href = 'https://api.stormpath.com/v1/tenants/1/accounts'
+        coll.query = lambda email=None: [self._stored({'href': 'found', 'email': 'a@example.com'})]
+
+        deleted = MagicMock()
+        deleted._store.get_resource.side_effect = Error({}, 404)
+
+        saved = resources.index
+        try:
+            for stale in (self._stored({'email': 'renamed@example.com'}), deleted):
+                resources.index = MagicMock()
+                resources.index.lookup.return_value = 'https://api.stormpath.com/v1/accounts/1'
+                coll.get.return_value = stale
+
+                ret, data = resources.find_resource_data(coll, 'email', 'a@example.com', ttl=60)
+                self.assertEqual(data['href'], 'found')
+                resources.index.forget.assert_called_once_with('key ' + coll.href, 'email', 'a@example.com')
+                resources.index.store.assert_called_once_with('key ' + coll.href, 'email', 'a@example.com', 'found', 60)
+        finally:
+            resources.index = saved
+
+    def test_group_lookups_only_wait_for_the_same_name(self):
+        fast_done = threading.Event()
+        waited = []
+
+        def query(name):
+            if name == 'slow':
+                waited.append(fast_done.wait(2))
+            return [MagicMock(href='groups/' + name)] if name != 'missing' else []
+
+        account = MagicMock()
+        account.directory.groups.href = 'directories/1/groups'
+        account.directory.groups.query.side_effect = query
+
+        with patch.dict(resources._group_hrefs, clear=True):
+            slow = threading.Thread(target=resources.find_group_href, args=(account, 'slow'))
+            slow.start()
+            while not account.directory.groups.query.called:
+                fast_done.wait(0.01)
+
+            self.assertEqual(resources.find_group_href(account, 'fast'), 'groups/fast')
+            fast_done.set()
+            slow.join()
+
+            self.assertEqual(waited, [True])
+            self.assertEqual(resources._group_hrefs[('directories/1/groups', 'slow')], 'groups/slow')
+
+            # misses are remembered too
+            self.assertIsNone(resources.find_group_href(account, 'missing'))
+            self.assertIsNone(resources.find_group_href(account, 'missing'))
+            self.assertEqual(account.directory.groups.query.call_count, 3)
+
+    def _paged_collection(self, size):
+        def get_resource(href, params):
+            offset, limit = params['offset'], params['limit']
+            items = [{'href': str(i)} for i in range(offset, min(offset + limit, size))]
+            return {'offset': offset, 'limit': limit, 'size': size, 'items': items}
+
+        coll = MagicMock()
+        coll._query = None
+        coll._store.get_resource = MagicMock(side_effect=get_resource)
+        return coll
+
+    def test_iter_collection_data_yields_every_page_in_order(self):
+        coll = self._paged_collection(250)
+        rows = list(resources.iter_collection_data(coll))
+        self.assertEqual([r['href'] for r in rows], [str(i) for i in range(250)])
+        self.assertEqual(coll._store.get_resource.call_count, 3)
+
+    def test_prefetched_iter_collection_data_keeps_order(self):
+        coll = self._paged_collection(1050)
+        rows = list(resources.iter_collection_data(coll, prefetch=3))
+        self.assertEqual([r['href'] for r in rows], [str(i) for i in range(1050)])
+        self.assertEqual(coll._store.get_resource.call_count, 11)
+
+    def test_prefetched_pages_are_projected_to_fields(self):
+        coll = self._paged_collection(250)
+        rows = list(resources.iter_collection_data(coll, prefetch=2, fields=resources.parse_fields('href, given_name')))
+        self.assertEqual(rows[249], {'href': '249', 'givenName': None})
+
+    def test_limited_listing_stops_requesting_pages(self):
+        coll = self._paged_collection(1000000)
+        rows = list(resources.iter_collection_data(coll, offset=20, limit=10))
+        self.assertEqual([r['href'] for r in rows], [str(i) for i in range(20, 30)])
+        coll._store.get_resource.assert_called_once_with(coll.href, params={'offset': 20, 'limit': 10})
+
+    def test_prefetched_limited_listing_requests_only_the_needed_pages(self):
+        coll = self._paged_collection(1000)
+        rows = list(resources.iter_collection_data(coll, prefetch=4, offset=5, limit=250))
+        self.assertEqual([r['href'] for r in rows], [str(i) for i in range(5, 255)])
+        self.assertEqual(sorted((c[1]['params']['offset'], c[1]['params']['limit']) for c in coll._store.get_resource.call_args_list),
+            [(5, 100), (105, 100), (205, 50)])
+
+    def test_projecting_a_page_does_not_modify_the_decoded_page(self):
+        page = {'size': 1, 'items': [{'href': 'a', 'email': 'e', 'surname': 's'}]}
+        coll = MagicMock(_query=None)
+        coll._store.get_resource.return_value = page
+
+        ret = resources.get_collection_page(coll, fields=['email'])
+        self.assertEqual(ret['items'], [{'email': 'e'}])
+        self.assertEqual(page['items'][0]['surname'], 's')
+
+    def test_context_collections_are_built_from_the_context_href(self):
+        client = MagicMock()
+        href = Client.BASE_URL + '/directories/test'
+        args = {'--in-directory': href}
+
+        accounts = resources.get_accounts(client, args)
+        self.assertIsInstance(accounts, AccountList)
+        self.assertEquals(accounts.href, href + '/accounts')
+
+        groups = resources.get_groups(client, args)
+        self.assertIsInstance(groups, GroupList)
+        self.assertEquals(groups.href, href + '/groups')
+
+        self.assertEquals(client.mock_calls, [])
+
+    def test_mappings_require_an_application_context(self):
+        client = MagicMock()
+        href = Client.BASE_URL + '/applications/test'
+
+        mappings = resources.get_mappings(client, {'--in-application': href})
+        self.assertIsInstance(mappings, AccountStoreMappingList)
+        self.assertEquals(mappings.href, href + '/accountStoreMappings')
+
+        args = {'--in-directory': Client.BASE_URL + '/directories/test'}
+        self.assertRaises(ValueError, resources.get_mappings, client, args)
+
+    def test_changed_attributes_compare_against_camel_case_data(self):
+        data = {'status': 'ENABLED', 'givenName': 'Ann'}
+        self.assertEqual(resources.changed_attributes(data, {'status': 'ENABLED', 'given_name': 'Ann'}), {})
+        self.assertEqual(
+            resources.changed_attributes(data, {'status': 'DISABLED', 'given_name': 'Ann', 'surname': 'Smith'}),
+            {'status': 'DISABLED', 'surname': 'Smith'})
+
+    def test_save_resource_data_sends_camel_case_attributes(self):
+        coll = MagicMock()
+        resources.save_resource_data(coll, 'accounts/1', {'given_name': 'Ann'})
+        coll._store.update_resource.assert_called_once_with('accounts/1', {'givenName': 'Ann'})
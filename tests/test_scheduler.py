@@ -0,0 +1,130 @@
+import time
+import unittest
+
+from requests import Session
+
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from stormpath_cli import scheduler
+
+from stub_api import StubAPI
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_window_is_halved_once_per_throttling_round(self):
+        s = scheduler.Scheduler(max_concurrency=8)
+        started = [s.acquire() for _ in range(4)]
+
+        for t in started:
+            s.release(t, 429)
+
+        self.assertEqual(s.window, 4.0)
+        self.assertEqual(s.counters['throttled'], 4)
+        self.assertEqual(s.in_flight, 0)
+
+        for _ in range(4):
+            s.release(s.acquire(), 200)
+
+        # grows by about one slot per window of successful responses
+        self.assertTrue(4.9 < s.window < 5.0)
+
+    def test_only_throttled_or_idempotent_requests_are_retried(self):
+        s = scheduler.Scheduler(max_retries=2)
+        self.assertTrue(s.should_retry('POST', 429, 0))
+        self.assertFalse(s.should_retry('POST', 503, 0))
+        self.assertFalse(s.should_retry('POST', None, 0))
+        self.assertTrue(s.should_retry('GET', 503, 0))
+        self.assertTrue(s.should_retry('DELETE', None, 1))
+        self.assertFalse(s.should_retry('GET', 503, 2))
+        self.assertFalse(s.should_retry('GET', 404, 0))
+
+    def test_parsing_retry_after(self):
+        self.assertEqual(scheduler.parse_retry_after('2'), 2.0)
+        self.assertEqual(scheduler.parse_retry_after('Wed, 21 Oct 2015 07:28:10 GMT', now=1445412480), 10.0)
+        self.assertIsNone(scheduler.parse_retry_after('soon'))
+        self.assertIsNone(scheduler.parse_retry_after(None))
+
+
+class TestScheduledAdapter(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubAPI().start()
+        self.api.seed('/accounts', 1)
+        self.scheduler = scheduler.Scheduler(max_concurrency=4, max_retries=3, backoff=0.01)
+        self.session = Session()
+        self.session.mount('http://', scheduler.ScheduledAdapter(self.scheduler))
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+
+    def test_throttled_requests_wait_for_retry_after(self):
+        self.api.throttle(2, retry_after=0.2)
+
+        start = time.time()
+        resp = self.session.get(self.api.href('/accounts'))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(len(self.api.requests), 3)
+        self.assertEqual(self.scheduler.counters['retries'], 2)
+        self.assertEqual(self.scheduler.window, 2.0)
+
+    def test_server_errors_are_retried_until_giving_up(self):
+        self.api.throttle(10, status=500)
+
+        resp = self.session.get(self.api.href('/accounts'))
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(len(self.api.requests), 4)
+
+        self.api.faults = []
+        self.assertEqual(self.session.get(self.api.href('/accounts')).status_code, 200)
+
+
+class RetryingExecutor(object):
+    """Retries throttled requests and server errors like the SDK's
+    HttpExecutor."""
+
+    MAX_RETRIES = 4
+
+    def __init__(self):
+        self.session = Session()
+
+    def request(self, method, url):
+        for _ in range(self.MAX_RETRIES + 1):
+            response = self.session.request(method, url, json={} if method == 'POST' else None)
+            if response.status_code != 429 and response.status_code < 500:
+                break
+
+        return response
+
+
+class TestScheduleClient(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubAPI().start()
+        self.executor = RetryingExecutor()
+        self.client = MagicMock()
+        self.client.data_store.executor = self.executor
+
+    def tearDown(self):
+        self.executor.session.close()
+        self.api.stop()
+
+    def test_only_the_scheduler_retries(self):
+        self.api.throttle(100, status=503)
+
+        with patch.object(scheduler, '_scheduler', scheduler.Scheduler(max_retries=3, backoff=0.01)):
+            scheduler.schedule_client(self.client)
+
+            self.assertEqual(self.executor.request('GET', self.api.href('/accounts')).status_code, 503)
+            self.assertEqual(len(self.api.requests), 4)
+
+            # server errors of non-idempotent requests aren't retried at all
+            del self.api.requests[:]
+            self.assertEqual(self.executor.request('POST', self.api.href('/accounts')).status_code, 503)
+            self.assertEqual(len(self.api.requests), 1)
@@ -0,0 +1,65 @@
+import unittest
+
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from stormpath_cli import main, shell
+
+
+class TestShell(unittest.TestCase):
+
+    def test_parsing_commands(self):
+        args = shell.parse_command("stormpath list accounts -A 'My App'", {})
+        self.assertEqual(args['<action>'], 'list')
+        self.assertEqual(args['<resource>'], 'accounts')
+        self.assertEqual(args['--in-application'], 'My App')
+
+    def test_blank_lines_and_comments_are_skipped(self):
+        self.assertIsNone(shell.parse_command('', {}))
+        self.assertIsNone(shell.parse_command('   # just a comment', {}))
+
+    def test_session_options_apply_to_every_command(self):
+        session = {'--apikeyfile': 'key.properties'}
+        self.assertEqual(shell.parse_command('list applications', session)['--apikeyfile'], 'key.properties')
+        args = shell.parse_command('list applications -k other.properties', session)
+        self.assertEqual(args['--apikeyfile'], 'other.properties')
+
+    def test_shell_runs_commands_with_a_shared_client_until_exit(self):
+        lines = iter(['list applications', '--no-such-option', 'shell', 'create directory test', 'exit', 'unreached'])
+        get_client = MagicMock()
+
+        with patch.object(shell, '_read_line', side_effect=lambda: next(lines)), \
+                patch.object(shell, '_setup_history'), \
+                patch.object(main, 'run_command') as run_command, \
+                patch.object(main, 'shared_client_factory', return_value=get_client):
+            self.assertTrue(shell.run_shell({}))
+
+        self.assertEqual(run_command.call_count, 2)
+        for (arguments,), kwargs in run_command.call_args_list:
+            self.assertIs(kwargs['get_client'], get_client)
+
+        self.assertEqual(next(lines), 'unreached')
+
+    def test_shell_survives_failing_commands(self):
+        lines = iter(['list applications', 'delete application test', 'list groups', 'exit'])
+
+        with patch.object(shell, '_read_line', side_effect=lambda: next(lines)), \
+                patch.object(shell, '_setup_history'), \
+                patch.object(main, 'run_command', side_effect=[KeyError('bug'), SystemExit(1), 0]) as run_command, \
+                patch.object(main, 'shared_client_factory', return_value=MagicMock()):
+            self.assertTrue(shell.run_shell({}))
+
+        self.assertEqual(run_command.call_count, 3)
+
+    def test_shared_client_factory_reuses_clients(self):
+        with patch.object(main, 'create_client', side_effect=lambda args: object()) as create_client:
+            get_client = main.shared_client_factory()
+            a = get_client({'--apikey': 'id:secret'})
+            b = get_client({'--apikey': 'id:secret'})
+            c = get_client({'--apikey': 'other:secret'})
+
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(create_client.call_count, 2)
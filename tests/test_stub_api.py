@@ -0,0 +1,97 @@
+import time
+import unittest
+
+from requests import Session
+
+from stub_api import StubAPI
+
+
+class TestStubAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubAPI().start()
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.api.stop()
+
+    def _get(self, path, **params):
+        return self.session.get(self.api.href(path), params=params).json()
+
+    def test_seeding_millions_of_resources_is_lazy(self):
+        start = time.time()
+        self.api.seed('/directories/1/accounts', 2000000, email='user{i}@example.com')
+
+        page = self._get('/directories/1/accounts', offset=1999990, limit=100)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(page['size'], 2000000)
+        self.assertEqual(len(page['items']), 10)
+        self.assertEqual(page['items'][-1]['email'], 'user1999999@example.com')
+        self.assertEqual(page['items'][-1]['directory']['href'], self.api.href('/directories/1'))
+
+    def test_searching(self):
+        self.api.seed('/accounts', 50, email='user{i}@example.com', status='ENABLED')
+
+        self.assertEqual(self._get('/accounts', q='USER4')['size'], 11)
+        self.assertEqual(self._get('/accounts', email='user1*')['size'], 11)
+        self.assertEqual(self._get('/accounts', email='user7@example.com', status='enabled')['size'], 1)
+
+    def test_searching_and_ordering_by_date(self):
+        self.api.seed('/accounts', 10)
+        self.session.post(self.api.href('/accounts/2'), json={'status': 'DISABLED'})
+
+        page = self._get('/accounts', modifiedAt='[2017-01-01T00:00:08.000Z,]')
+        self.assertEqual([i['href'] for i in page['items']],
+            [self.api.href('/accounts/2'), self.api.href('/accounts/8'), self.api.href('/accounts/9')])
+        self.assertEqual(self._get('/accounts', createdAt='(2017-01-01T00:00:08.000Z,]')['size'], 1)
+
+        page = self._get('/accounts', orderBy='modifiedAt desc', limit=2)
+        self.assertEqual([i['href'] for i in page['items']], [self.api.href('/accounts/2'), self.api.href('/accounts/9')])
+
+        self.api.date_ranges = False
+        self.assertEqual(self.session.get(self.api.href('/accounts'), params={'modifiedAt': '[2017-01-01,]'}).status_code, 400)
+
+    def test_expanding_links(self):
+        self.api.seed('/directories', 1)
+        self.api.seed('/directories/0/accounts', 2)
+        self.api.seed('/directories/0/groups', 3)
+
+        page = self._get('/directories/0/accounts', expand='directory,groups(offset:0,limit:2)')
+        self.assertEqual(page['items'][0]['directory']['name'], 'directories-0')
+        self.assertEqual(page['items'][1]['groups']['limit'], 2)
+
+        account = self._get('/directories/0/accounts/1', expand='directory')
+        self.assertEqual(account['directory']['name'], 'directories-0')
+        self.assertEqual(set(self._get('/directories/0/accounts/1')['directory']), set(['href']))
+
+    def test_creating_updating_and_deleting(self):
+        self.api.seed('/directories/1/accounts', 3)
+        href = self.api.href('/directories/1/accounts/1')
+
+        created = self.session.post(self.api.href('/directories/1/accounts'), json={'email': 'new@example.com'})
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(created.json()['status'], 'ENABLED')
+
+        self.assertEqual(self.session.post(href, json={'status': 'DISABLED'}).json()['status'], 'DISABLED')
+        self.assertEqual(self._get('/directories/1/accounts', status='DISABLED')['size'], 1)
+
+        self.assertEqual(self.session.delete(href).status_code, 204)
+        self.assertEqual(self.session.get(href).status_code, 404)
+
+        items = self._get('/directories/1/accounts')['items']
+        self.assertEqual([i['email'] if 'email' in i else i['name'] for i in items],
+            ['directories/1/accounts-0', 'directories/1/accounts-2', 'new@example.com'])
+
+    def test_group_memberships_fill_both_collections(self):
+        self.api.seed('/directories/1/accounts', 1)
+        self.api.seed('/directories/1/groups', 1)
+        account, group = self.api.href('/directories/1/accounts/0'), self.api.href('/directories/1/groups/0')
+
+        self.session.post(self.api.href('/groupMemberships'), json={'account': {'href': account}, 'group': {'href': group}})
+        self.assertEqual(self._get('/directories/1/groups/0/accounts')['items'][0]['href'], account)
+        self.assertEqual(self._get('/directories/1/accounts/0/groups')['items'][0]['href'], group)
+
+    def test_tenant_links_to_the_top_level_collections(self):
+        tenant = self._get('/tenants/current')
+        self.assertEqual(tenant['applications']['href'], self.api.href('/applications'))
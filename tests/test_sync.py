@@ -0,0 +1,119 @@
+import json
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from stormpath_cli import sync
+from stub_api import StubAPI, StubClient
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubAPI().start()
+        self.api.seed('/accounts', 250, email='user{i}@example.com')
+        self.client = StubClient(self.api)
+        self.session = self.client.data_store.session
+
+        self.path = tempfile.mkdtemp()
+        self.args = {'<resource>': join(self.path, 'snapshot.db'), '--results': join(self.path, 'changes.jsonl')}
+
+    def tearDown(self):
+        self.client.close()
+        self.api.stop()
+        shutil.rmtree(self.path)
+
+    def _sync(self):
+        del self.api.requests[:]
+        ret = sync.sync_tenant(self.client, self.args)
+        with open(self.args['--results']) as fd:
+            return ret, [json.loads(line) for line in fd]
+
+    def _account_requests(self):
+        return [query for method, path, query in self.api.requests if path == '/accounts']
+
+    def _change_tenant(self):
+        self.session.post(self.api.href('/accounts/7'), json={'status': 'DISABLED'})
+        self.session.post(self.api.href('/accounts'), json={'email': 'new@example.com'})
+        self.session.delete(self.api.href('/accounts/3'))
+
+    def test_first_sync_fetches_everything(self):
+        ret, changes = self._sync()
+
+        self.assertEqual(ret['created'], 250)
+        self.assertEqual(len(changes), 250)
+        self.assertEqual(changes[0]['change'], 'created')
+        self.assertEqual(changes[0]['resource']['email'], 'user0@example.com')
+        self.assertEqual(len(self._account_requests()), 3)
+
+    def test_sync_fetches_only_changes(self):
+        self._sync()
+        self._change_tenant()
+
+        ret, changes = self._sync()
+
+        self.assertEqual((ret['created'], ret['updated'], ret['deleted']), (1, 1, 1))
+        self.assertEqual(sorted((c['change'], c['href']) for c in changes), [
+            ('created', self.api.href('/accounts/new1')),
+            ('deleted', self.api.href('/accounts/3')),
+            ('updated', self.api.href('/accounts/7')),
+        ])
+        self.assertTrue(self._account_requests()[0]['modifiedAt'].startswith('[2017-01-01T00:04:09.000Z,'))
+
+    def test_as_many_deletions_as_creations_are_found(self):
+        self._sync()
+        for i in range(3):
+            self.session.post(self.api.href('/accounts'), json={'email': 'new{}@example.com'.format(i)})
+            self.session.delete(self.api.href('/accounts/{}'.format(i)))
+
+        ret, changes = self._sync()
+
+        self.assertEqual((ret['created'], ret['deleted']), (3, 3))
+        self.assertEqual(sorted(c['href'] for c in changes if c['change'] == 'deleted'),
+            [self.api.href('/accounts/{}'.format(i)) for i in range(3)])
+
+    def test_sync_without_changes_skips_the_full_listing(self):
+        self._sync()
+
+        ret, changes = self._sync()
+
+        self.assertEqual(changes, [])
+        self.assertEqual(len(self._account_requests()), 2)
+
+    def test_sync_walks_by_modification_time_without_date_searches(self):
+        self.api.date_ranges = False
+        self._sync()
+        self.session.post(self.api.href('/accounts/7'), json={'status': 'DISABLED'})
+
+        ret, changes = self._sync()
+
+        self.assertEqual([(c['change'], c['href']) for c in changes], [('updated', self.api.href('/accounts/7'))])
+        walked = [q for q in self._account_requests() if q.get('orderBy') == 'modifiedAt desc']
+        self.assertEqual(len(walked), 1)
+
+    def test_interrupted_sync_is_repeated_in_full(self):
+        self.api.seed('/groups', 3, name='group{i}')
+        sync_collection = sync._sync_collection
+
+        def fail_on_accounts(snapshot, name, *args):
+            if name == 'accounts':
+                raise IOError('Connection reset.')
+            return sync_collection(snapshot, name, *args)
+
+        with patch.object(sync, '_sync_collection', fail_on_accounts):
+            self.assertRaises(IOError, sync.sync_tenant, self.client, self.args)
+
+        ret, changes = self._sync()
+
+        self.assertEqual(ret['created'], 253)
+        self.assertEqual(len([c for c in changes if c['collection'] == 'groups']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
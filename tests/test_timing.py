@@ -0,0 +1,51 @@
+import unittest
+from time import sleep
+
+from six import StringIO
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from stormpath_cli import timing
+
+
+class TestTiming(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.multiple(timing, _enabled=True, _totals=timing.OrderedDict(), _counts={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_spans_are_excluded_from_the_outer_one(self):
+        with timing.span('output'):
+            sleep(0.02)
+            for _ in range(2):
+                with timing.span('http'):
+                    sleep(0.05)
+
+        self.assertGreaterEqual(timing._totals['http'], 0.1)
+        self.assertLess(timing._totals['output'], 0.05)
+        self.assertEqual(timing._counts['http'], 2)
+
+    def test_spans_are_not_recorded_when_disabled(self):
+        timing._enabled = False
+        with timing.span('http'):
+            pass
+
+        self.assertEqual(timing._totals, {})
+
+    def test_report_lists_phases_in_order(self):
+        timing.add('imports', 0.02)
+        timing.add('docopt', 0.001)
+        timing.add('http', 0.5, count=3)
+
+        out = StringIO()
+        timing.report(out)
+        lines = out.getvalue().splitlines()
+
+        self.assertTrue(lines[0].startswith('Profile: '))
+        self.assertEqual([l.split()[0] for l in lines[1:]], ['imports', 'docopt', 'http'])
+        self.assertIn('500.0 ms', lines[3])
+        self.assertTrue(lines[3].endswith('(3 calls)'))
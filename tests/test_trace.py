@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from requests import Session
+from six import StringIO
+
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from stormpath_cli import trace
+
+from stub_api import StubAPI
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_endpoints_replace_resource_ids(self):
+        base = 'https://api.stormpath.com/v1'
+        self.assertEqual(trace.endpoint(base + '/accounts/1gk4Dxzi6o4Pbdlexample'), '/accounts/{id}')
+        self.assertEqual(trace.endpoint(base + '/directories/abc/accounts?offset=100'), '/directories/{id}/accounts')
+        self.assertEqual(trace.endpoint(base + '/tenants/current'), '/tenants/{id}')
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(trace.percentile(values, 50), 50)
+        self.assertEqual(trace.percentile(values, 99), 99)
+        self.assertEqual(trace.percentile([7], 95), 7)
+        self.assertEqual(trace.percentile([], 95), 0)
+
+    def test_tracing_requests(self):
+        tmp = tempfile.mkdtemp()
+        api = StubAPI().start()
+        api.seed('/directories/1/accounts', 3)
+
+        session = Session()
+        client = MagicMock()
+        client.data_store.executor.session = session
+
+        dump = os.path.join(tmp, 'trace.jsonl')
+        with patch.multiple(trace, _enabled=False, _dump=None, _endpoints=trace.OrderedDict()):
+            trace.enable(dump)
+            trace.trace_client(client)
+            trace.trace_client(client)
+
+            for i in range(3):
+                session.get(api.href('/directories/1/accounts/{}'.format(i)))
+            session.get(api.href('/directories/1/accounts/9'))
+            session.get(api.href('/directories/1/accounts'))
+
+            out = StringIO()
+            trace.report(out)
+
+        session.close()
+        api.stop()
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('Trace: 5 requests, '))
+        self.assertEqual(lines[2].split()[:4], ['GET', '/directories/{id}/accounts/{id}', '4', '1'])
+        self.assertEqual(lines[3].split()[:4], ['GET', '/directories/{id}/accounts', '1', '0'])
+
+        with open(dump) as fd:
+            entries = [json.loads(line) for line in fd]
+        shutil.rmtree(tmp)
+
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(entries[3]['status'], 404)
+        self.assertEqual(sorted(entries[0].keys()), ['bytes', 'endpoint', 'latency', 'method', 'status', 'url'])